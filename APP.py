@@ -15,7 +15,7 @@ from urllib.parse import urlparse
 from flask_wtf.csrf import CSRFProtect
 from flask_session import Session  # For server-side session storage
 # ONC Compliance: Audit logging
-from audit_logger import get_audit_logger, audit_ephi_access, log_user_authentication
+from audit_logger import get_audit_logger, get_session_patient_id, audit_ephi_access, log_user_authentication
 # ONC Compliance: CCD Export
 from ccd_generator import generate_ccd_from_session_data
 
@@ -71,8 +71,16 @@ CERNER_DOMAIN = 'cerner.com'
 # Load environment variables from .env file
 load_dotenv()
 
+# Cache DNS lookups for outbound FHIR/OAuth connections (DNS_CACHE_TTL seconds, 0 disables)
+from dns_cache import install_dns_cache
+install_dns_cache()
+
 app = Flask(__name__)
 
+# Serialize JSON responses (jsonify) with orjson
+from json_provider import ORJSONProvider
+app.json = ORJSONProvider(app)
+
 # R-01 Risk Mitigation: Ensure FLASK_SECRET_KEY is set from environment
 SECRET_KEY = get_secret('FLASK_SECRET_KEY')
 if not SECRET_KEY:
@@ -82,15 +90,23 @@ if not SECRET_KEY:
 app.secret_key = SECRET_KEY
 
 # Configure Flask-Session for server-side session storage
-app.config['SESSION_TYPE'] = 'filesystem'
 app.config['SESSION_PERMANENT'] = False
-# Determine session directory based on environment
-if os.environ.get('GAE_ENV', '').startswith('standard'):
-    # Use secure temp directory for Google App Engine
-    import tempfile
-    app.config['SESSION_FILE_DIR'] = os.path.join(tempfile.gettempdir(), 'flask_session')
+SESSION_REDIS_URL = os.environ.get('SESSION_REDIS_URL')
+if SESSION_REDIS_URL:
+    # Opt-in Redis backend: sessions are shared across workers/instances
+    # instead of living on each container's local disk
+    import redis
+    app.config['SESSION_TYPE'] = 'redis'
+    app.config['SESSION_REDIS'] = redis.from_url(SESSION_REDIS_URL)
 else:
-    app.config['SESSION_FILE_DIR'] = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'flask_session')
+    app.config['SESSION_TYPE'] = 'filesystem'
+    # Determine session directory based on environment
+    if os.environ.get('GAE_ENV', '').startswith('standard'):
+        # Use secure temp directory for Google App Engine
+        import tempfile
+        app.config['SESSION_FILE_DIR'] = os.path.join(tempfile.gettempdir(), 'flask_session')
+    else:
+        app.config['SESSION_FILE_DIR'] = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'flask_session')
 
 # Enable secure and HttpOnly cookies
 app.config['SESSION_COOKIE_HTTPONLY'] = True
@@ -155,7 +171,8 @@ def calculate_risk_api():
             return jsonify({'error': 'Patient ID is required.'}), 400
         patient_id = data['patientId']
         fhir_session_data = session['fhir_data']
-        raw_data, error = fhir_data_service.get_fhir_data(
+        # 經由 views 的短期快取（並接續 /main 渲染時已開始的背景獲取），避免重複查詢 FHIR 伺服器
+        raw_data, error = views.get_fhir_data_cached(
             fhir_server_url=fhir_session_data.get('server'),
             access_token=fhir_session_data.get('token'),
             patient_id=patient_id,
@@ -231,7 +248,7 @@ def export_ccd_api():
         app.logger.info(f"Request data keys: {list(data.keys())}")
         
         # Get patient data from session
-        patient_id = session.get('patient_id', 'N/A')
+        patient_id = get_session_patient_id('N/A')
         app.logger.info(f"Patient ID from session: {patient_id}")
         
         # Get or retrieve risk assessment data
@@ -367,7 +384,7 @@ def submit_complaint():
         'contact_email': request.form.get('contact_email', '').strip(),
         'user_agent': request.headers.get('User-Agent', 'unknown'),
         'ip_address': request.remote_addr,
-        'session_patient_id': session.get('patient_id', 'N/A')  # Non-PHI context only
+        'session_patient_id': get_session_patient_id('N/A')  # Non-PHI context only
     }
     
     # Validate required fields
@@ -413,7 +430,7 @@ def logout():
     # ONC Compliance: Audit logout event
     audit_logger = get_audit_logger()
     user_id = session.get('session_id', 'unknown')
-    patient_id = session.get('patient_id')
+    patient_id = get_session_patient_id()
     logout_reason = 'manual' if request.method == 'GET' else 'timeout_or_manual'
     
     audit_logger.log_event(
@@ -512,6 +529,17 @@ app.register_blueprint(hooks_bp)  # CDS Hooks
 csrf.exempt(smart_auth.auth_bp)
 csrf.exempt(views.views_bp)
 
+# Cache compiled Jinja templates on disk so workers and restarts skip recompilation.
+# The default directory is a per-user temp dir created with owner-only permissions.
+# Template mtime checks already follow debug mode (Flask's TEMPLATES_AUTO_RELOAD default).
+from jinja2 import FileSystemBytecodeCache
+
+app.jinja_env.bytecode_cache = FileSystemBytecodeCache()
+
+# Compile the most frequently rendered templates at startup instead of on first request
+for _template_name in ('main.html', 'error.html'):
+    app.jinja_env.get_template(_template_name)
+
 if __name__ == '__main__':
     # R-08 Risk Mitigation: Enhanced production environment checks
     is_production = (
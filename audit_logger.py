@@ -266,6 +266,16 @@ def get_audit_logger() -> AuditLogger:
     return _audit_logger
 
 
+def get_session_patient_id(default: Optional[str] = None) -> Optional[str]:
+    """
+    Return the patient ID of the current FHIR session.
+    
+    Args:
+        default: Value returned when there is no session or no patient
+    """
+    return (session.get('fhir_data') or {}).get('patient') or default
+
+
 def audit_ephi_access(action: str, 
                      resource_type: Optional[str] = None,
                      details: Optional[Dict[str, Any]] = None):
@@ -290,7 +300,7 @@ def audit_ephi_access(action: str,
             audit_logger = get_audit_logger()
             
             # Extract context from Flask request and session
-            patient_id = session.get('patient_id') or kwargs.get('patient_id')
+            patient_id = get_session_patient_id(kwargs.get('patient_id'))
             user_id = session.get('user_id') or session.get('session_id', 'unknown')
             ip_address = request.remote_addr
             user_agent = request.headers.get('User-Agent', 'unknown')
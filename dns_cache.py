@@ -0,0 +1,67 @@
+"""
+DNS Cache for Outbound Connections
+為對外連線（FHIR 伺服器、OAuth 端點）快取 socket.getaddrinfo 結果
+"""
+
+import logging
+import os
+import socket
+import threading
+from time import monotonic
+
+DEFAULT_TTL = 300
+
+_original_getaddrinfo = None
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def install_dns_cache(ttl=None, maxsize=256):
+    """
+    以帶 TTL 的快取包裝 socket.getaddrinfo（只快取成功的解析結果）
+    requests/urllib3 每次建立新連線都會解析主機名稱，快取可省去重複的 DNS 查詢
+
+    Args:
+        ttl: 快取秒數；未指定時讀取 DNS_CACHE_TTL 環境變數（預設 300，0 表示停用）
+        maxsize: 最多快取的 (host, port, ...) 組合數量
+
+    Returns:
+        bool: 是否已安裝快取
+    """
+    global _original_getaddrinfo
+
+    if ttl is None:
+        try:
+            ttl = int(os.environ.get('DNS_CACHE_TTL', DEFAULT_TTL))
+        except ValueError:
+            logging.warning("Invalid DNS_CACHE_TTL value; using default of %ss", DEFAULT_TTL)
+            ttl = DEFAULT_TTL
+    if ttl <= 0 or _original_getaddrinfo is not None:
+        return _original_getaddrinfo is not None
+
+    # 在 gevent worker 下，此時 socket 已被 monkey-patch，包裝的是 gevent 的解析器
+    original = socket.getaddrinfo
+
+    def cached_getaddrinfo(*args, **kwargs):
+        key = (args, tuple(sorted(kwargs.items())))
+        now = monotonic()
+        with _cache_lock:
+            entry = _cache.get(key)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+
+        result = original(*args, **kwargs)
+        with _cache_lock:
+            if len(_cache) >= maxsize:
+                # 先清除過期項目，仍滿則整體清空（主機數量很少，不需要 LRU）
+                for stale_key in [k for k, v in _cache.items() if v[0] <= now]:
+                    del _cache[stale_key]
+                if len(_cache) >= maxsize:
+                    _cache.clear()
+            _cache[key] = (now + ttl, result)
+        return result
+
+    _original_getaddrinfo = original
+    socket.getaddrinfo = cached_getaddrinfo
+    logging.info("DNS cache installed (ttl=%ss)", ttl)
+    return True
@@ -6,6 +6,7 @@ FHIR Data Service - 主入口點
 原始 1926 行代碼已拆分為 7 個專注的模組
 """
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
 # 導入新模組
 from services.cdss_config_loader import get_loinc_codes, get_text_search_terms
@@ -17,7 +18,12 @@ from services.fhir_client import (
     fetch_patient_resource,
     fetch_observations_by_loinc,
     fetch_observations_by_text,
-    fetch_conditions
+    fetch_conditions,
+    observation_search_url,
+    condition_search_url,
+    fetch_batch,
+    bundle_resources,
+    latest_observation
 )
 from services.precise_hbr_calculator import (
     calculate_precise_hbr_score,
@@ -32,6 +38,7 @@ from services.tradeoff_calculator import (
     detect_tradeoff_factors,
     convert_hr_to_probability,
     calculate_tradeoff_scores_interactive,
+    calculate_tradeoff_scores_batch,
     calculate_tradeoff_scores
 )
 
@@ -50,6 +57,7 @@ __all__ = [
     'get_tradeoff_model_predictors',
     'detect_tradeoff_factors',
     'calculate_tradeoff_scores_interactive',
+    'calculate_tradeoff_scores_batch',
     # 輔助函數
     'get_value_from_observation',
     'check_bleeding_history',
@@ -63,6 +71,82 @@ __all__ = [
 LOINC_CODES = get_loinc_codes()
 TEXT_SEARCH_TERMS = get_text_search_terms()
 
+def _fetch_observation_type(patient_id, resource_type, codes, fhir_server, loinc_result=None):
+    """
+    獲取單一 PRECISE-HBR 參數類型的觀察資料
+    先按 LOINC codes 搜尋，無結果時以文字搜尋作為降級
+    
+    Args:
+        patient_id: 患者 ID
+        resource_type: 觀察類型（如 'HEMOGLOBIN'）
+        codes: 該類型的 LOINC codes
+        fhir_server: FHIR 伺服器實例
+        loinc_result: 已由 batch 請求取得的 LOINC 查詢結果；None 表示需自行查詢
+    
+    Returns:
+        list: 觀察資料列表；發生錯誤時返回空列表
+    """
+    try:
+        # 首先，嘗試按 LOINC codes 搜尋（batch 已取得結果時直接使用）
+        if loinc_result is not None:
+            obs_list = loinc_result
+        else:
+            obs_list = fetch_observations_by_loinc(
+                patient_id,
+                resource_type,
+                codes,
+                fhir_server
+            )
+        
+        # 如果 LOINC codes 沒有結果，嘗試文字搜尋作為降級
+        if not obs_list and resource_type in TEXT_SEARCH_TERMS:
+            obs_list = fetch_observations_by_text(
+                patient_id,
+                resource_type,
+                TEXT_SEARCH_TERMS[resource_type],
+                fhir_server
+            )
+        
+        if obs_list:
+            logging.info(f"Final result: {len(obs_list)} {resource_type} observation(s)")
+        else:
+            logging.warning(f"No {resource_type} observations found for patient {patient_id}")
+        return obs_list
+        
+    except Exception as e:
+        # 淨化日誌
+        logging.warning(f"Error fetching {resource_type} for patient {patient_id}. Type: {type(e).__name__}. Continuing with empty list.")
+        return []
+
+def _fetch_batched_searches(patient_id, fhir_server):
+    """
+    以單一 batch Bundle 送出所有 LOINC 觀察查詢及條件查詢
+    
+    Args:
+        patient_id: 患者 ID
+        fhir_server: FHIR 伺服器實例
+    
+    Returns:
+        tuple: (各觀察類型的 LOINC 結果 dict, 條件列表或 None)
+               未包含於結果中的類型或為 None 的條件，需由呼叫端逐一查詢
+    """
+    batch_types = [resource_type for resource_type, codes in LOINC_CODES.items() if codes]
+    request_urls = [observation_search_url(patient_id, LOINC_CODES[t]) for t in batch_types]
+    request_urls.append(condition_search_url(patient_id))
+    
+    bundles = fetch_batch(request_urls, fhir_server)
+    if bundles is None:
+        return {}, None
+    
+    loinc_results = {
+        resource_type: latest_observation(bundle)
+        for resource_type, bundle in zip(batch_types, bundles)
+        if bundle is not None
+    }
+    conditions = bundle_resources(bundles[-1]) if bundles[-1] is not None else None
+    logging.info(f"Batch request returned {len(loinc_results)} observation search(es) for patient {patient_id}")
+    return loinc_results, conditions
+
 def get_fhir_data(fhir_server_url, access_token, patient_id, client_id):
     """
     使用 fhirclient 函式庫獲取所有所需的患者資料
@@ -95,41 +179,30 @@ def get_fhir_data(fhir_server_url, access_token, patient_id, client_id):
 
         raw_data = {"patient": patient_resource_json}
         
-        # 按 LOINC codes 獲取 PRECISE-HBR 參數的觀察資料
-        for resource_type, codes in LOINC_CODES.items():
-            obs_list = []
-            
-            try:
-                # 首先，嘗試按 LOINC codes 搜尋
-                obs_list = fetch_observations_by_loinc(
-                    patient_id,
-                    resource_type,
-                    codes,
-                    smart.server
-                )
-                
-                # 如果 LOINC codes 沒有結果，嘗試文字搜尋作為降級
-                if not obs_list and resource_type in TEXT_SEARCH_TERMS:
-                    obs_list = fetch_observations_by_text(
-                        patient_id,
-                        resource_type,
-                        TEXT_SEARCH_TERMS[resource_type],
-                        smart.server
-                    )
-                
-                raw_data[resource_type] = obs_list
-                if obs_list:
-                    logging.info(f"Final result: {len(obs_list)} {resource_type} observation(s)")
-                else:
-                    logging.warning(f"No {resource_type} observations found for patient {patient_id}")
-                
-            except Exception as e:
-                # 淨化日誌
-                logging.warning(f"Error fetching {resource_type} for patient {patient_id}. Type: {type(e).__name__}. Continuing with empty list.")
-                raw_data[resource_type] = []
+        # 先嘗試以單一 batch Bundle 取得所有 LOINC 觀察與條件查詢結果
+        loinc_results, batch_conditions = _fetch_batched_searches(patient_id, smart.server)
         
-        # 獲取條件（用於出血史）
-        raw_data['conditions'] = fetch_conditions(patient_id, smart.server)
+        # 各觀察類型與條件查詢彼此獨立，並行送出以重疊網路往返時間
+        # （batch 已取得的項目直接使用，未取得的項目改為逐一查詢）
+        with ThreadPoolExecutor(max_workers=len(LOINC_CODES) + 1) as executor:
+            obs_futures = {
+                resource_type: executor.submit(
+                    _fetch_observation_type, patient_id, resource_type, codes, smart.server,
+                    loinc_results.get(resource_type))
+                for resource_type, codes in LOINC_CODES.items()
+            }
+            conditions_future = None
+            if batch_conditions is None:
+                conditions_future = executor.submit(fetch_conditions, patient_id, smart.server)
+            
+            for resource_type, future in obs_futures.items():
+                raw_data[resource_type] = future.result()
+            
+            # 獲取條件（用於出血史）
+            if conditions_future is not None:
+                raw_data['conditions'] = conditions_future.result()
+            else:
+                raw_data['conditions'] = batch_conditions
         
         # 獲取最少的藥物資料以保持兼容性
         raw_data['med_requests'] = []
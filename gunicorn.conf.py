@@ -0,0 +1,19 @@
+"""
+Gunicorn configuration for PRECISE-HBR SMART on FHIR application
+Gunicorn 設定檔 - 容器啟動時由 Dockerfile 透過 `-c gunicorn.conf.py` 載入
+"""
+import multiprocessing
+import os
+
+# 與 Dockerfile EXPOSE 的 port 一致
+bind = os.environ.get('GUNICORN_BIND', ':8080')
+
+# 請求大多阻塞在對 FHIR 伺服器的網路 I/O；gevent worker 讓單一程序
+# 在等待 socket 時可以同時服務其他請求。gevent worker 在載入應用程式前
+# 會自行執行 monkey.patch_all()，因此 requests/threading 都會協作式讓出
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gevent')
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2))
+
+# FHIR 查詢（尤其是 Condition）可能很慢，與原本的 --timeout 120 一致
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
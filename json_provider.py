@@ -0,0 +1,71 @@
+"""
+orjson-backed JSON Provider for Flask
+Flask JSON 序列化改用 orjson（jsonify、request.get_json 等皆經此處理）
+"""
+
+import orjson
+from flask.json.provider import DefaultJSONProvider
+
+# orjson 能直接表達的 dumps 參數；其他參數（如 indent=4、ensure_ascii）改由標準庫處理
+_ORJSON_DUMPS_KWARGS = frozenset(('default', 'sort_keys', 'indent', 'separators'))
+
+
+class ORJSONProvider(DefaultJSONProvider):
+    """
+    JSON provider that serializes with orjson.
+
+    Keeps Flask's default behavior where it matters to clients:
+    - keys are sorted when ``sort_keys`` is enabled (Flask default)
+    - datetimes are passed through to Flask's default handler (HTTP date format)
+    - other unsupported types (Decimal, objects with ``__html__``) use Flask's
+      default conversion
+    - ``indent=2`` and compact separators are honored; any other keyword
+      argument falls back to Flask's ``json``-based implementation
+    - responses are indented when ``compact`` is False or in debug mode
+
+    Unlike the stdlib encoder, non-ASCII text is emitted as UTF-8 rather than
+    ``\\u`` escapes; the decoded value is the same.
+    """
+
+    def dumps(self, obj, **kwargs) -> str:
+        if not self._orjson_supports(kwargs):
+            return super().dumps(obj, **kwargs)
+        return self._dumps_bytes(
+            obj,
+            default=kwargs.get('default', self.default),
+            sort_keys=kwargs.get('sort_keys', self.sort_keys),
+            indent=kwargs.get('indent') is not None,
+        ).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        """Build the response from orjson bytes, skipping the str re-encode."""
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        body = self._dumps_bytes(obj, indent=indent, newline=True)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+    @staticmethod
+    def _orjson_supports(kwargs):
+        """Return True if orjson can produce exactly what these dumps kwargs ask for."""
+        if not _ORJSON_DUMPS_KWARGS.issuperset(kwargs):
+            return False
+        separators = kwargs.get('separators')
+        if separators is not None and tuple(separators) != (',', ':'):
+            return False
+        return kwargs.get('indent') in (None, 2)
+
+    def _dumps_bytes(self, obj, default=None, sort_keys=None, indent=False, newline=False) -> bytes:
+        option = (orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+                  | orjson.OPT_PASSTHROUGH_DATETIME)
+        if self.sort_keys if sort_keys is None else sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        if newline:
+            option |= orjson.OPT_APPEND_NEWLINE
+        return orjson.dumps(obj, default=default or self.default, option=option)
@@ -2,7 +2,16 @@
 FHIR Client Module
 FHIR 資料獲取和客戶端管理
 """
+import hashlib
 import logging
+import threading
+import time
+from urllib.parse import urlencode
+
+from cachetools import TTLCache
+from cachetools.keys import hashkey
+from requests.exceptions import Timeout
+
 from fhirclient import client
 from fhirclient.models import patient, observation, condition, medicationrequest, procedure
 
@@ -13,6 +22,26 @@ from services.fhir_utils import resource_has_code
 LOINC_CODES = get_loinc_codes()
 TEXT_SEARCH_TERMS = get_text_search_terms()
 
+# 已知不支援 batch Bundle 的伺服器（base URI），之後直接改用逐一查詢
+_BATCH_UNSUPPORTED = set()
+# batch 逾時後會改為逐一查詢（Condition 查詢本身可達 90 秒），
+# 兩者相加須低於 gunicorn 的 120 秒 worker timeout
+_BATCH_TIMEOUT = 20
+# batch 逾時的伺服器（base URI -> 到期時間），期間內直接改用逐一查詢
+_BATCH_TIMED_OUT = {}
+_BATCH_TIMED_OUT_TTL = 600
+
+# 已設定好的 FHIR 客戶端快取：同一 (伺服器, token, 病人, client_id) 重複使用同一個
+# requests.Session，讓多次 get_fhir_data 之間共用 keep-alive 連線池。
+# 鍵使用 token 雜湊；TTL 讓過期 token 的客戶端不會一直留在記憶體中
+_CLIENT_CACHE = TTLCache(maxsize=64, ttl=1800)
+_CLIENT_CACHE_LOCK = threading.Lock()
+
+def _client_cache_key(fhir_server_url, access_token, patient_id, client_id):
+    """Build the client cache key without keeping the plaintext token."""
+    token_hash = hashlib.sha256((access_token or '').encode('utf-8')).hexdigest()[:16]
+    return hashkey(fhir_server_url, token_hash, patient_id, client_id)
+
 def setup_fhir_client(fhir_server_url, access_token, patient_id, client_id):
     """
     設置並配置 FHIR 客戶端
@@ -24,7 +53,7 @@ def setup_fhir_client(fhir_server_url, access_token, patient_id, client_id):
         client_id: 客戶端 ID
     
     Returns:
-        tuple: (FHIR client, is_test_mode)
+        tuple: (FHIR client, is_test_mode)；相同參數會返回快取的同一個客戶端
     """
     # 檢測測試模式（用於開發/測試，無需 OAuth）
     is_test_mode = (access_token == 'test-mode-no-auth')
@@ -32,6 +61,12 @@ def setup_fhir_client(fhir_server_url, access_token, patient_id, client_id):
     if is_test_mode:
         logging.info(f"TEST MODE: Fetching data without authentication from {fhir_server_url}")
     
+    cache_key = _client_cache_key(fhir_server_url, access_token, patient_id, client_id)
+    with _CLIENT_CACHE_LOCK:
+        cached_client = _CLIENT_CACHE.get(cache_key)
+    if cached_client is not None:
+        return cached_client, is_test_mode
+    
     # 按照 smart-on-fhir/client-py 最佳實踐設置 FHIR 客戶端
     settings = {
         'app_id': client_id,
@@ -51,6 +86,9 @@ def setup_fhir_client(fhir_server_url, access_token, patient_id, client_id):
     # 為 session 設置自定義 adapter 和 timeout（適用於兩種模式）
     _setup_timeout_adapter(smart, is_test_mode, access_token)
     
+    # 設定過程拋出例外時不會快取
+    with _CLIENT_CACHE_LOCK:
+        _CLIENT_CACHE[cache_key] = smart
     return smart, is_test_mode
 
 def _setup_authenticated_client(smart, access_token):
@@ -315,3 +353,138 @@ def fetch_conditions(patient_id, fhir_server):
     
     return conditions_list
 
+def observation_search_url(patient_id, codes):
+    """
+    建立與 fetch_observations_by_loinc 相同條件的 Observation 查詢相對 URL
+    
+    Args:
+        patient_id: 患者 ID
+        codes: LOINC codes 列表
+    
+    Returns:
+        str: 相對 URL（用於 batch Bundle 的 request.url）
+    """
+    return 'Observation?' + urlencode({
+        'patient': patient_id,
+        'code': ','.join(codes),
+        '_count': '5'
+    })
+
+def condition_search_url(patient_id):
+    """
+    建立與 fetch_conditions 相同條件的 Condition 查詢相對 URL
+    
+    Args:
+        patient_id: 患者 ID
+    
+    Returns:
+        str: 相對 URL（用於 batch Bundle 的 request.url）
+    """
+    return 'Condition?' + urlencode({'patient': patient_id, '_count': '100'})
+
+def fetch_batch(request_urls, fhir_server):
+    """
+    以單一 batch Bundle（POST 至伺服器根目錄）送出多個 GET 查詢，
+    將多次網路往返合併為一次
+    
+    Args:
+        request_urls: 相對查詢 URL 列表
+        fhir_server: FHIR 伺服器實例（使用其已設定認證的 session）
+    
+    Returns:
+        list or None: 依序對應每個查詢的 searchset Bundle（dict；該項失敗時為 None）；
+                      伺服器不支援 batch 或請求失敗時返回 None，由呼叫端改用逐一查詢
+    """
+    base_uri = getattr(fhir_server, 'base_uri', None)
+    session = getattr(fhir_server, 'session', None)
+    if not request_urls or not base_uri or session is None or base_uri in _BATCH_UNSUPPORTED:
+        return None
+    if _BATCH_TIMED_OUT.get(base_uri, 0) > time.monotonic():
+        return None
+    
+    batch_bundle = {
+        'resourceType': 'Bundle',
+        'type': 'batch',
+        'entry': [{'request': {'method': 'GET', 'url': url}} for url in request_urls]
+    }
+    
+    try:
+        response = session.post(
+            base_uri,
+            json=batch_bundle,
+            headers={'Content-Type': 'application/fhir+json', 'Accept': 'application/fhir+json'},
+            timeout=_BATCH_TIMEOUT
+        )
+    except Timeout:
+        # 記住逾時，避免之後每個請求都先等待 batch 逾時再逐一查詢
+        _BATCH_TIMED_OUT[base_uri] = time.monotonic() + _BATCH_TIMED_OUT_TTL
+        logging.warning(f"Batch request timed out after {_BATCH_TIMEOUT}s, falling back to individual searches")
+        return None
+    except Exception as e:
+        logging.warning(f"Batch request failed, falling back to individual searches. Error type: {type(e).__name__}")
+        return None
+    
+    if response.status_code != 200:
+        if response.status_code in (405, 501):
+            # 伺服器明確不支援 batch：記住後不再嘗試（400/404 等可能只是暫時性或查詢問題）
+            _BATCH_UNSUPPORTED.add(base_uri)
+        logging.info(f"Batch request returned HTTP {response.status_code}, falling back to individual searches")
+        return None
+    
+    try:
+        result = response.json()
+    except ValueError:
+        _BATCH_UNSUPPORTED.add(base_uri)
+        logging.warning("Batch response was not valid JSON, falling back to individual searches")
+        return None
+    
+    if not isinstance(result, dict) or result.get('resourceType') != 'Bundle':
+        _BATCH_UNSUPPORTED.add(base_uri)
+        logging.warning("Batch response was not a Bundle, falling back to individual searches")
+        return None
+    
+    entries = result.get('entry', [])
+    if len(entries) != len(request_urls):
+        logging.warning("Unexpected batch response shape, falling back to individual searches")
+        return None
+    
+    bundles = []
+    for entry in entries:
+        status = str(entry.get('response', {}).get('status', ''))
+        resource = entry.get('resource')
+        if status.startswith('200') and resource and resource.get('resourceType') == 'Bundle':
+            bundles.append(resource)
+        else:
+            bundles.append(None)
+    return bundles
+
+def bundle_resources(bundle_json):
+    """
+    從 searchset Bundle（dict）取出所有資源
+    
+    Args:
+        bundle_json: searchset Bundle
+    
+    Returns:
+        list: 資源 JSON 列表
+    """
+    return [entry['resource'] for entry in bundle_json.get('entry', []) if entry.get('resource')]
+
+def latest_observation(bundle_json):
+    """
+    從 searchset Bundle（dict）取出最新的一筆觀察資料，排序方式與
+    fetch_observations_by_loinc 相同
+    
+    Args:
+        bundle_json: searchset Bundle
+    
+    Returns:
+        list: 最多一筆的觀察資料列表
+    """
+    resources = bundle_resources(bundle_json)
+    if not resources:
+        return []
+    return [max(
+        resources,
+        key=lambda r: r.get('effectiveDateTime') or r.get('effectivePeriod', {}).get('start') or '1900-01-01'
+    )]
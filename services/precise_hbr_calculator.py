@@ -471,10 +471,9 @@ def get_risk_category_info(precise_hbr_score):
             "score_range": f"(score ≥27)"
         }
 
-def get_precise_hbr_display_info(precise_hbr_score):
+def _build_precise_hbr_display_info(precise_hbr_score):
     """
-    獲取 PRECISE-HBR 分數的完整顯示資訊
-    包括風險類別、出血風險百分比和建議
+    計算 PRECISE-HBR 分數的完整顯示資訊（不經查表）
     
     Args:
         precise_hbr_score: PRECISE-HBR 分數
@@ -495,6 +494,28 @@ def get_precise_hbr_display_info(precise_hbr_score):
         "recommendation": f"1-year risk of major bleeding: {bleeding_risk_percent:.2f}% (Bleeding Academic Research Consortium [BARC] type 3 or 5)"
     }
 
+# 分數為有界整數（實際最高約 69 分），於載入時預先計算 0-100 分的顯示資訊
+_DISPLAY_INFO_MAX_SCORE = 100
+_DISPLAY_INFO_TABLE = tuple(
+    _build_precise_hbr_display_info(score) for score in range(_DISPLAY_INFO_MAX_SCORE + 1)
+)
+
+def get_precise_hbr_display_info(precise_hbr_score):
+    """
+    獲取 PRECISE-HBR 分數的完整顯示資訊
+    包括風險類別、出血風險百分比和建議
+    整數分數直接查表；其他值（如浮點數或超出範圍）即時計算
+    
+    Args:
+        precise_hbr_score: PRECISE-HBR 分數
+    
+    Returns:
+        dict: 完整的顯示資訊（副本，可安全修改）
+    """
+    if type(precise_hbr_score) is int and 0 <= precise_hbr_score <= _DISPLAY_INFO_MAX_SCORE:
+        return dict(_DISPLAY_INFO_TABLE[precise_hbr_score])
+    return _build_precise_hbr_display_info(precise_hbr_score)
+
 def calculate_risk_components(raw_data, demographics):
     """
     使用 PRECISE-HBR 計算出血風險分數的主函數
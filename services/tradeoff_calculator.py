@@ -4,23 +4,130 @@ Tradeoff Analysis Calculator
 
 基於 ARC-HBR 模型計算出血和血栓風險
 """
+import functools
+import hashlib
 import json
 import logging
 import math
 import os
+import sys
+import threading
 
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+from cachetools import LRUCache, cached
+from cachetools.keys import hashkey
 from fhirclient import client
 from fhirclient.models import observation, condition, medicationrequest, procedure
+from fhirclient.models.fhirabstractbase import FHIRValidationError
 
 from services.cdss_config_loader import get_cdss_config
 from services.unit_conversion import TARGET_UNITS, get_value_from_observation
 from services.fhir_utils import resource_has_code, calculate_egfr
 
+# 編碼系統 URL（intern 後在比對時可先以指標相等判斷）
+SNOMED_SYS = sys.intern('http://snomed.info/sct')
+RXNORM_SYS = sys.intern('http://www.nlm.nih.gov/research/umls/rxnorm')
+
+# --- 模型快取 ---
+# 構建相對於此腳本的路徑以避免生產中的 FileNotFoundError
+_MODEL_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)),  # 回到主目錄
+    'fhir_resources', 'valuesets', 'arc-hbr-model.json'
+)
+_TRADEOFF_MODEL = None
+_PREDICTOR_VECTORS = None
+
+# FHIRClient 快取：以 (伺服器, token 雜湊, client_id) 為鍵，401 時可單獨移除該項
+_CLIENT_CACHE = LRUCache(maxsize=32)
+_CLIENT_CACHE_LOCK = threading.Lock()
+
+def _token_hash(access_token):
+    """返回訪問令牌的短雜湊（快取鍵使用，不保存明文 token）"""
+    return hashlib.sha256((access_token or '').encode('utf-8')).hexdigest()[:16]
+
+@cached(_CLIENT_CACHE, lock=_CLIENT_CACHE_LOCK)
+def _make_client(server_url, token_hash, client_id):
+    """
+    建立並快取預先配置好的 FHIRClient
+    
+    以 token 雜湊而非 token 本身作為快取鍵，避免在快取中保存明文 token。
+    同一個 (伺服器, token, client_id) 會重複使用同一個 requests.Session，
+    讓 HTTP keep-alive 在多次呼叫之間共用 TCP/TLS 連線。
+    
+    Args:
+        server_url: FHIR 伺服器 URL
+        token_hash: 訪問令牌的短雜湊
+        client_id: 客戶端 ID
+    
+    Returns:
+        FHIRClient: 已掛載連線池 adapter 的客戶端
+    """
+    settings = {
+        'app_id': client_id,
+        'api_base': server_url
+    }
+    fhir_client = client.FHIRClient(settings=settings)
+    
+    if not hasattr(fhir_client.server, 'session'):
+        fhir_client.server.session = requests.Session()
+    
+    adapter = HTTPAdapter(pool_connections=10, pool_maxsize=10)
+    fhir_client.server.session.mount('http://', adapter)
+    fhir_client.server.session.mount('https://', adapter)
+    return fhir_client
+
+def _get_tradeoff_client(server_url, access_token, client_id):
+    """取得（或建立）快取的 FHIRClient 並設置 Authorization header"""
+    fhir_client = _make_client(server_url, _token_hash(access_token), client_id)
+    # 這是為 session 設置 header 的正確方式
+    fhir_client.server.session.headers["Authorization"] = f"Bearer {access_token}"
+    return fhir_client
+
+def _invalidate_client_on_unauthorized(error, server_url, access_token, client_id):
+    """
+    收到 401 時只移除此 (伺服器, token, client_id) 的快取客戶端，下次呼叫將重新建立
+
+    fhirclient 的 FHIRUnauthorizedException 與 requests 的 HTTPError 都帶有 response，
+    因此以狀態碼判斷，而不依賴特定的例外類別
+    """
+    response = getattr(error, 'response', None)
+    if response is not None and getattr(response, 'status_code', None) == 401:
+        logging.warning("FHIR server returned 401 for tradeoff model data; evicting cached client")
+        with _CLIENT_CACHE_LOCK:
+            _CLIENT_CACHE.pop(hashkey(server_url, _token_hash(access_token), client_id), None)
+
+def _search_with_elements(resource_class, search_params, elements, server):
+    """
+    以 _elements 參數執行搜尋，只要求伺服器返回需要的欄位
+    
+    elements 除了實際讀取的欄位外也包含資源的必填欄位，
+    讓 fhirclient 能解析精簡後的資源；若伺服器返回的資源仍無法通過
+    fhirclient 驗證，則降級為不帶 _elements 的完整搜尋。
+    忽略 _elements 的伺服器會直接返回完整資源，不需特別處理。
+    
+    Args:
+        resource_class: fhirclient 資源類別
+        search_params: 搜尋參數
+        elements: 逗號分隔的欄位名稱
+        server: FHIR 伺服器實例
+    
+    Returns:
+        Bundle: 搜尋結果
+    """
+    try:
+        return resource_class.where({**search_params, '_elements': elements}).perform(server)
+    except FHIRValidationError as e:
+        logging.info("Subsetted %s search could not be parsed (%s); retrying without _elements",
+                     resource_class.__name__, type(e).__name__)
+        return resource_class.where(search_params).perform(server)
+
 def get_tradeoff_model_data(fhir_server_url, access_token, client_id, patient_id):
     """
     獲取出血-血栓權衡模型所需的額外資料
     這補充了 get_fhir_data 獲取的資料
-    現在創建自己的客戶端以提高穩健性
+    使用依伺服器與 token 快取的客戶端，以便在多位患者之間重用連線
     
     Args:
         fhir_server_url: FHIR 伺服器 URL
@@ -32,18 +139,7 @@ def get_tradeoff_model_data(fhir_server_url, access_token, client_id, patient_id
         dict: Tradeoff 資料
     """
     try:
-        settings = {
-            'app_id': client_id,
-            'api_base': fhir_server_url
-        }
-        fhir_client = client.FHIRClient(settings=settings)
-        
-        # 這是為 session 設置 header 的正確方式
-        import requests
-        if not hasattr(fhir_client.server, 'session'):
-            fhir_client.server.session = requests.Session()
-        fhir_client.server.session.headers["Authorization"] = f"Bearer {access_token}"
-
+        fhir_client = _get_tradeoff_client(fhir_server_url, access_token, client_id)
     except Exception as e:
         logging.error(f"Failed to create FHIRClient in get_tradeoff_model_data: {e}")
         # 客戶端創建失敗時返回空資料結構
@@ -69,46 +165,49 @@ def get_tradeoff_model_data(fhir_server_url, access_token, client_id, patient_id
         search_params = {'patient': patient_id, '_count': '200'}
         # 注意：fhirclient 的 perform() 不接受 timeout 參數
         # Timeout 通過 session 上的 HTTPAdapter 配置
-        conditions = condition.Condition.where(search_params).perform(fhir_client.server)
+        conditions = _search_with_elements(condition.Condition, search_params, 'code,subject', fhir_client.server)
         
         if conditions.entry:
+            # 從配置中獲取 SNOMED codes（迴圈外讀取一次）
+            config = get_cdss_config()
+            snomed_codes = config.get('tradeoff_analysis', {}).get('snomed_codes', {})
+            diabetes_code = snomed_codes.get('diabetes', '73211009')
+            mi_code = snomed_codes.get('myocardial_infarction', '22298006')
+            nstemi_code = snomed_codes.get('nstemi', '164868009')
+            stemi_code = snomed_codes.get('stemi', '164869001')
+            copd_code = snomed_codes.get('copd', '13645005')
+            
             for entry in conditions.entry:
-                c = entry.resource
-                # 從配置中獲取 SNOMED codes
-                config = get_cdss_config()
-                snomed_codes = config.get('tradeoff_analysis', {}).get('snomed_codes', {})
+                c_json = entry.resource.as_json()
                 
                 # 糖尿病
-                diabetes_code = snomed_codes.get('diabetes', '73211009')
-                if resource_has_code(c.as_json(), 'http://snomed.info/sct', diabetes_code):
+                if resource_has_code(c_json, SNOMED_SYS, diabetes_code):
                     tradeoff_data["diabetes"] = True
                 
                 # 心肌梗塞
-                mi_code = snomed_codes.get('myocardial_infarction', '22298006')
-                if resource_has_code(c.as_json(), 'http://snomed.info/sct', mi_code):
+                if resource_has_code(c_json, SNOMED_SYS, mi_code):
                     tradeoff_data["prior_mi"] = True
                 
                 # NSTEMI/STEMI
-                nstemi_code = snomed_codes.get('nstemi', '164868009')
-                stemi_code = snomed_codes.get('stemi', '164869001')
-                if resource_has_code(c.as_json(), 'http://snomed.info/sct', nstemi_code) or \
-                   resource_has_code(c.as_json(), 'http://snomed.info/sct', stemi_code):
+                if resource_has_code(c_json, SNOMED_SYS, nstemi_code) or \
+                   resource_has_code(c_json, SNOMED_SYS, stemi_code):
                     tradeoff_data["nstemi_stemi"] = True
                 
                 # COPD
-                copd_code = snomed_codes.get('copd', '13645005')
-                if resource_has_code(c.as_json(), 'http://snomed.info/sct', copd_code):
+                if resource_has_code(c_json, SNOMED_SYS, copd_code):
                     tradeoff_data["copd"] = True
 
     except Exception as e:
         logging.warning(f"Error fetching conditions for tradeoff model: {e}")
+        _invalidate_client_on_unauthorized(e, fhir_server_url, access_token, client_id)
 
     # 從 Observations 檢查吸菸狀態
     try:
         search_params = {'patient': patient_id, 'code': '72166-2'}  # Smoking status LOINC
         # 注意：fhirclient 的 perform() 不接受 timeout 參數
         # Timeout 通過 session 上的 HTTPAdapter 配置
-        obs_search = observation.Observation.where(search_params).perform(fhir_client.server)
+        obs_search = _search_with_elements(
+            observation.Observation, search_params, 'status,code,effective,value', fhir_client.server)
         if obs_search and obs_search.entry:
             # 按日期安全排序
             sorted_obs = []
@@ -131,13 +230,14 @@ def get_tradeoff_model_data(fhir_server_url, access_token, client_id, patient_id
                         tradeoff_data["smoker"] = True
     except Exception as e:
         logging.warning(f"Error fetching smoking status: {e}", exc_info=True)
+        _invalidate_client_on_unauthorized(e, fhir_server_url, access_token, client_id)
 
     # 從 Procedures 檢查複雜 PCI 和 BMS
     try:
         search_params = {'patient': patient_id, '_count': '50'}
         # 注意：fhirclient 的 perform() 不接受 timeout 參數
         # Timeout 通過 session 上的 HTTPAdapter 配置
-        procedures = procedure.Procedure.where(search_params).perform(fhir_client.server)
+        procedures = _search_with_elements(procedure.Procedure, search_params, 'code,status,subject', fhir_client.server)
         if procedures.entry:
             # 從配置中獲取 SNOMED codes
             config = get_cdss_config()
@@ -146,44 +246,84 @@ def get_tradeoff_model_data(fhir_server_url, access_token, client_id, patient_id
             bms_code = snomed_codes.get('bare_metal_stent', '427183000')
             
             for entry in procedures.entry:
-                p = entry.resource
+                p_json = entry.resource.as_json()
                 # 複雜 PCI
-                if resource_has_code(p.as_json(), 'http://snomed.info/sct', complex_pci_code):
+                if resource_has_code(p_json, SNOMED_SYS, complex_pci_code):
                     tradeoff_data["complex_pci"] = True
                 # 裸金屬支架 (BMS)
-                if resource_has_code(p.as_json(), 'http://snomed.info/sct', bms_code):
+                if resource_has_code(p_json, SNOMED_SYS, bms_code):
                     tradeoff_data["bms_used"] = True
     except Exception as e:
         logging.warning(f"Error fetching procedures for tradeoff model: {e}")
+        _invalidate_client_on_unauthorized(e, fhir_server_url, access_token, client_id)
         
     # 從 MedicationRequest 檢查出院時的 OAC
     try:
         search_params = {'patient': patient_id, 'category': 'outpatient'}
         # 注意：fhirclient 的 perform() 不接受 timeout 參數
         # Timeout 通過 session 上的 HTTPAdapter 配置
-        med_requests = medicationrequest.MedicationRequest.where(search_params).perform(fhir_client.server)
+        med_requests = _search_with_elements(
+            medicationrequest.MedicationRequest, search_params, 'status,intent,subject,medication', fhir_client.server)
         if med_requests.entry:
             # 從配置中獲取 RxNorm codes
             config = get_cdss_config()
             rxnorm_codes = config.get('tradeoff_analysis', {}).get('rxnorm_codes', {})
-            oac_codes = [
-                rxnorm_codes.get('warfarin', '11289'),
-                rxnorm_codes.get('rivaroxaban', '21821'),
-                rxnorm_codes.get('apixaban', '1364430'),
-                rxnorm_codes.get('dabigatran', '1037042'),
-                rxnorm_codes.get('edoxaban', '1537033')
-            ]
+            oac_codes = frozenset(
+                rxnorm_codes.get(name, default_code) for name, default_code in (
+                    ('warfarin', '11289'),
+                    ('rivaroxaban', '21821'),
+                    ('apixaban', '1364430'),
+                    ('dabigatran', '1037042'),
+                    ('edoxaban', '1537033')
+                )
+            )
             
             for entry in med_requests.entry:
-                mr = entry.resource
-                # 檢查口服抗凝劑
-                if any(resource_has_code(mr.as_json(), 'http://www.nlm.nih.gov/research/umls/rxnorm', code) for code in oac_codes):
+                mr_json = entry.resource.as_json()
+                # 檢查口服抗凝劑：單次掃描 coding 並以集合成員檢查比對
+                codings = mr_json.get('medicationCodeableConcept', {}).get('coding', [])
+                if any(coding.get('system') == RXNORM_SYS and
+                       coding.get('code') in oac_codes for coding in codings):
                     tradeoff_data["oac_discharge"] = True
+                    break
     except Exception as e:
         logging.warning(f"Error fetching medication requests for OAC: {e}")
+        _invalidate_client_on_unauthorized(e, fhir_server_url, access_token, client_id)
 
     return tradeoff_data
 
+def _load_tradeoff_model():
+    """
+    讀取並快取 ARC-HBR 模型（整個程序生命週期最多成功開啟檔案一次）
+    
+    Returns:
+        dict: tradeoffModel 字典
+    
+    Raises:
+        FileNotFoundError: 模型檔案不存在
+        json.JSONDecodeError: 模型檔案不是有效的 JSON
+        KeyError: JSON 中缺少 'tradeoffModel' 鍵
+    """
+    global _TRADEOFF_MODEL
+    
+    if _TRADEOFF_MODEL is not None:
+        return _TRADEOFF_MODEL
+    
+    logging.info("Loading tradeoff model from: %s", _MODEL_PATH)
+    with open(_MODEL_PATH, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    
+    if 'tradeoffModel' not in data:
+        logging.error("'tradeoffModel' key not found in JSON. Available keys: %s", list(data.keys()))
+        raise KeyError('tradeoffModel')
+    
+    model = data['tradeoffModel']
+    logging.info("Tradeoff model loaded successfully. Bleeding predictors: %d",
+                 len(model.get('bleedingEvents', {}).get('predictors', [])))
+    logging.info("Thrombotic predictors: %d", len(model.get('thromboticEvents', {}).get('predictors', [])))
+    _TRADEOFF_MODEL = model
+    return model
+
 def get_tradeoff_model_predictors():
     """
     從 ARC-HBR 模型檔案載入並返回所有預測因子列表
@@ -191,36 +331,10 @@ def get_tradeoff_model_predictors():
     Returns:
         dict or None: 模型字典，如果載入失敗則為 None
     """
-    script_dir = os.path.dirname(os.path.dirname(__file__))  # 回到主目錄
-    model_path = os.path.join(script_dir, 'fhir_resources', 'valuesets', 'arc-hbr-model.json')
-    
-    # 添加詳細日誌以進行雲端部署調試
-    logging.info(f"Attempting to load tradeoff model from: {model_path}")
-    logging.info(f"Script directory: {script_dir}")
-    logging.info(f"File exists: {os.path.exists(model_path)}")
-    
     try:
-        with open(model_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            logging.info(f"JSON loaded successfully. Keys: {list(data.keys())}")
-            
-            if 'tradeoffModel' not in data:
-                logging.error(f"'tradeoffModel' key not found in JSON. Available keys: {list(data.keys())}")
-                return None
-                
-            model = data['tradeoffModel']
-            logging.info(f"Tradeoff model loaded successfully. Bleeding predictors: {len(model.get('bleedingEvents', {}).get('predictors', []))}")
-            logging.info(f"Thrombotic predictors: {len(model.get('thromboticEvents', {}).get('predictors', []))}")
-            return model
-            
+        return _load_tradeoff_model()
     except FileNotFoundError as e:
-        logging.error(f"File not found: {model_path}. Error: {e}")
-        # 列出目錄中的檔案以進行調試
-        try:
-            files = os.listdir(script_dir)
-            logging.error(f"Files in directory {script_dir}: {files}")
-        except Exception as list_error:
-            logging.error(f"Could not list directory contents: {list_error}")
+        logging.error(f"File not found: {_MODEL_PATH}. Error: {e}")
         return None
     except KeyError as e:
         logging.error(f"Key error when parsing JSON: {e}")
@@ -310,6 +424,49 @@ def detect_tradeoff_factors(raw_data, demographics, tradeoff_data):
         
     return detected_factors
 
+def make_hr_converter(baseline_event_rate):
+    """
+    為固定的基線事件率建立 HR → 機率轉換函數
+    
+    基線風險 -ln(1 - baseline_rate) 只隨配置改變，
+    因此預先計算一次，之後每次轉換不再需要 math.log
+    
+    Args:
+        baseline_event_rate: 基線事件率（百分比）
+    
+    Returns:
+        callable: 接受總 HR 分數並返回事件機率（百分比）的函數
+    """
+    # 將基線事件率（百分比）轉換為基線風險
+    # 公式：baseline_hazard = -ln(1 - baseline_rate/100)
+    baseline_rate_decimal = baseline_event_rate / 100.0  # 將 % 轉換為小數
+    
+    # 處理邊緣情況：如果 baseline_rate 為 100%，風險將是無限的
+    if baseline_rate_decimal >= 1.0:
+        return lambda total_hr_score: 100.0
+    
+    # 計算基線風險（1 年的累積風險）
+    baseline_hazard = -math.log(1 - baseline_rate_decimal)
+    
+    def convert(total_hr_score):
+        # 應用 HR 獲得調整後的風險
+        adjusted_hazard = baseline_hazard * total_hr_score
+        
+        # 使用生存函數轉換回機率
+        # P(事件) = 1 - S(t) = 1 - exp(-H(t))
+        # 其中 H(t) 是累積風險
+        event_probability = 1 - math.exp(-adjusted_hazard)
+        
+        # 轉換為百分比並四捨五入
+        return round(min(event_probability * 100.0, 100.0), 2)  # 上限為 100%
+    
+    return convert
+
+@functools.lru_cache(maxsize=8)
+def _get_hr_converters(bleeding_rate, thrombotic_rate):
+    """依 (出血基線率, 血栓基線率) 快取一對 HR 轉換函數"""
+    return make_hr_converter(bleeding_rate), make_hr_converter(thrombotic_rate)
+
 def convert_hr_to_probability(total_hr_score, baseline_event_rate):
     """
     將總 Hazard Ratio (HR) 分數轉換為估計的 1 年事件機率
@@ -334,30 +491,7 @@ def convert_hr_to_probability(total_hr_score, baseline_event_rate):
     Returns:
         float: 事件機率（百分比）
     """
-    # 將基線事件率（百分比）轉換為基線風險
-    # 公式：baseline_hazard = -ln(1 - baseline_rate/100)
-    baseline_rate_decimal = baseline_event_rate / 100.0  # 將 % 轉換為小數
-    
-    # 處理邊緣情況：如果 baseline_rate 為 100%，風險將是無限的
-    if baseline_rate_decimal >= 1.0:
-        return 100.0
-    
-    # 計算基線風險（1 年的累積風險）
-    baseline_hazard = -math.log(1 - baseline_rate_decimal)
-    
-    # 應用 HR 獲得調整後的風險
-    adjusted_hazard = baseline_hazard * total_hr_score
-    
-    # 使用生存函數轉換回機率
-    # P(事件) = 1 - S(t) = 1 - exp(-H(t))
-    # 其中 H(t) 是累積風險
-    survival_probability = math.exp(-adjusted_hazard)
-    event_probability = 1 - survival_probability
-    
-    # 轉換為百分比並四捨五入
-    event_probability_percent = event_probability * 100.0
-    
-    return round(min(event_probability_percent, 100.0), 2)  # 上限為 100%
+    return make_hr_converter(baseline_event_rate)(total_hr_score)
 
 def calculate_tradeoff_scores_interactive(model_predictors, active_factors):
     """
@@ -405,8 +539,9 @@ def calculate_tradeoff_scores_interactive(model_predictors, active_factors):
     # 將 HR 分數轉換為機率
     # 使用更準確的公式：風險 = 1 - exp(-baseline_hazard × HR × time)
     # 為簡單起見，近似：風險 ≈ baseline_rate × HR（當風險較低時有效）
-    bleeding_prob = convert_hr_to_probability(bleeding_score_hr, BASELINE_BLEEDING_RATE)
-    thrombotic_prob = convert_hr_to_probability(thrombotic_score_hr, BASELINE_THROMBOTIC_RATE)
+    to_bleeding_prob, to_thrombotic_prob = _get_hr_converters(BASELINE_BLEEDING_RATE, BASELINE_THROMBOTIC_RATE)
+    bleeding_prob = to_bleeding_prob(bleeding_score_hr)
+    thrombotic_prob = to_thrombotic_prob(thrombotic_score_hr)
 
     return {
         "bleeding_score": bleeding_prob,
@@ -415,6 +550,85 @@ def calculate_tradeoff_scores_interactive(model_predictors, active_factors):
         "thrombotic_factors": thrombotic_factors_details
     }
 
+def _get_predictor_vectors():
+    """
+    將模型預測因子轉換為 NumPy 向量（快取）
+    
+    Returns:
+        dict or None: {'bleeding': (keys, logHR 陣列), 'thrombotic': (keys, logHR 陣列)}，
+                      模型載入失敗時為 None
+    """
+    global _PREDICTOR_VECTORS
+    
+    if _PREDICTOR_VECTORS is not None:
+        return _PREDICTOR_VECTORS
+    
+    model = get_tradeoff_model_predictors()
+    if model is None:
+        return None
+    
+    vectors = {}
+    for event_type, model_key in (('bleeding', 'bleedingEvents'), ('thrombotic', 'thromboticEvents')):
+        predictors = model[model_key]['predictors']
+        keys = [p['factor'] for p in predictors]
+        log_hr = np.array([math.log(p['hazardRatio']) for p in predictors], dtype=float)
+        vectors[event_type] = (keys, log_hr)
+    
+    _PREDICTOR_VECTORS = vectors
+    return _PREDICTOR_VECTORS
+
+def _batch_probabilities(active_factors_list, keys, log_hr, baseline_event_rate):
+    """以向量化方式計算多組因素的事件機率（百分比）"""
+    baseline_rate_decimal = baseline_event_rate / 100.0
+    if baseline_rate_decimal >= 1.0:
+        return np.full(len(active_factors_list), 100.0)
+    
+    # (N_patients, N_predictors) 布林矩陣
+    mask = np.array(
+        [[bool(af.get(k, False)) for k in keys] for af in active_factors_list],
+        dtype=bool
+    ).reshape(len(active_factors_list), len(keys))
+    total_log_hr = (mask * log_hr).sum(axis=1)
+    
+    # P(事件) = 1 - (1 - baseline_rate) ^ HR，與 convert_hr_to_probability 等價
+    event_probability = 1 - (1 - baseline_rate_decimal) ** np.exp(total_log_hr)
+    return np.round(np.minimum(event_probability * 100.0, 100.0), 2)
+
+def calculate_tradeoff_scores_batch(active_factors_list):
+    """
+    批次計算多組 active_factors 的出血和血栓機率
+    用於患者群組評分或 "what-if" 敏感度分析
+    
+    結果與 calculate_tradeoff_scores_interactive 的分數相同，
+    但不包含逐項因素說明
+    
+    Args:
+        active_factors_list: active_factors 字典列表
+    
+    Returns:
+        list or None: 每組因素對應 {'bleeding_score', 'thrombotic_score'} 的列表，
+                      模型載入失敗時為 None
+    """
+    vectors = _get_predictor_vectors()
+    if vectors is None:
+        return None
+    if not active_factors_list:
+        return []
+    
+    config = get_cdss_config()
+    tradeoff_config = config.get('tradeoff_analysis', {})
+    baseline_rates = tradeoff_config.get('baseline_event_rates', {})
+    BASELINE_BLEEDING_RATE = baseline_rates.get('bleeding_rate_percent', 2.5)
+    BASELINE_THROMBOTIC_RATE = baseline_rates.get('thrombotic_rate_percent', 2.5)
+    
+    bleeding_probs = _batch_probabilities(active_factors_list, *vectors['bleeding'], BASELINE_BLEEDING_RATE)
+    thrombotic_probs = _batch_probabilities(active_factors_list, *vectors['thrombotic'], BASELINE_THROMBOTIC_RATE)
+    
+    return [
+        {"bleeding_score": float(b), "thrombotic_score": float(t)}
+        for b, t in zip(bleeding_probs, thrombotic_probs)
+    ]
+
 def calculate_tradeoff_scores(raw_data, demographics, tradeoff_data):
     """
     根據 ARC-HBR 權衡模型計算出血和血栓風險分數
@@ -427,30 +641,18 @@ def calculate_tradeoff_scores(raw_data, demographics, tradeoff_data):
     Returns:
         dict: 包含出血和血栓分數及因素的字典
     """
-    # 構建相對於此腳本的路徑以避免生產中的 FileNotFoundError
-    script_dir = os.path.dirname(os.path.dirname(__file__))  # 回到主目錄
-    model_path = os.path.join(script_dir, 'fhir_resources', 'valuesets', 'arc-hbr-model.json')
-    
-    # 添加詳細日誌以進行調試
-    logging.info(f"Loading tradeoff model from: {model_path}")
-    logging.info(f"File exists: {os.path.exists(model_path)}")
-    
     try:
-        with open(model_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            if 'tradeoffModel' not in data:
-                logging.error(f"'tradeoffModel' key not found in JSON")
-                return {
-                    "error": "Invalid model file structure.",
-                    "bleeding_score": 0,
-                    "thrombotic_score": 0,
-                    "bleeding_factors": [],
-                    "thrombotic_factors": []
-                }
-            model = data['tradeoffModel']
-            logging.info(f"Tradeoff model loaded successfully in calculate_tradeoff_scores")
+        _load_tradeoff_model()
+    except KeyError:
+        return {
+            "error": "Invalid model file structure.",
+            "bleeding_score": 0,
+            "thrombotic_score": 0,
+            "bleeding_factors": [],
+            "thrombotic_factors": []
+        }
     except FileNotFoundError:
-        logging.error(f"CRITICAL: arc-hbr-model.json not found at {model_path}. Tradeoff calculation will fail.")
+        logging.error(f"CRITICAL: arc-hbr-model.json not found at {_MODEL_PATH}. Tradeoff calculation will fail.")
         return {
             "error": "ARC-HBR model file not found on server.",
             "bleeding_score": 0,
@@ -538,8 +740,9 @@ def calculate_tradeoff_scores(raw_data, demographics, tradeoff_data):
     BASELINE_BLEEDING_RATE = baseline_rates.get('bleeding_rate_percent', 2.5)  # %（BARC 3-5 出血，1 年風險，參考組）
     BASELINE_THROMBOTIC_RATE = baseline_rates.get('thrombotic_rate_percent', 2.5)  # %（MI/ST，1 年風險，參考組）
     
-    bleeding_prob = convert_hr_to_probability(bleeding_score, BASELINE_BLEEDING_RATE)
-    thrombotic_prob = convert_hr_to_probability(thrombotic_score, BASELINE_THROMBOTIC_RATE)
+    to_bleeding_prob, to_thrombotic_prob = _get_hr_converters(BASELINE_BLEEDING_RATE, BASELINE_THROMBOTIC_RATE)
+    bleeding_prob = to_bleeding_prob(bleeding_score)
+    thrombotic_prob = to_thrombotic_prob(thrombotic_score)
 
     return {
         "bleeding_score": bleeding_prob,  # 現在返回機率 (%)，不是 HR
@@ -88,8 +88,8 @@ def get_value_from_observation(obs, unit_system):
     # 0. 如果單位缺失/空白，假設數值已經是目標單位
     # 這處理了不提供單位資訊的 FHIR 伺服器
     if not source_unit or source_unit.strip() == '':
-        logging.warning(f"No unit provided for Observation value {value}. "
-                       f"Assuming it is already in target unit '{target_unit}'.")
+        logging.warning("No unit provided for Observation value %s. "
+                        "Assuming it is already in target unit '%s'.", value, target_unit)
         return value
     
     # 1. 直接匹配
@@ -106,12 +106,12 @@ def get_value_from_observation(obs, unit_system):
     if source_unit in conversion_factors:
         conversion_factor = conversion_factors[source_unit]
         converted_value = value * conversion_factor
-        logging.info(f"Converted {value} {source_unit} to {converted_value:.2f} {target_unit}")
+        logging.info("Converted %s %s to %.2f %s", value, source_unit, converted_value, target_unit)
         return converted_value
 
     # 4. 如果無法轉換，記錄警告並返回 None 以防止錯誤計算
-    logging.warning(f"Unit mismatch and no conversion rule found for Observation. "
-                    f"Received: '{source_unit}', Expected: '{target_unit}'. Cannot proceed with this value.")
+    logging.warning("Unit mismatch and no conversion rule found for Observation. "
+                    "Received: '%s', Expected: '%s'. Cannot proceed with this value.", source_unit, target_unit)
     return None
 
 def normalize_unit_string(unit_string):
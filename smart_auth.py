@@ -305,8 +305,6 @@ def exchange_code():
             'refresh_token': token_response.get('refresh_token')
         }
         session['fhir_data'] = fhir_data
-        if 'patient' in token_response:
-            session['patient_id'] = token_response['patient']
 
         return jsonify({
             "status": "ok",
@@ -2,11 +2,106 @@
 """
 測試 FHIR 伺服器是否支援 SMART on FHIR Standalone Launch
 """
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
+from requests.adapters import HTTPAdapter
 import json
 
+# ijson 為可選依賴：可用時以串流方式解析 CapabilityStatement
+try:
+    import ijson
+    HAS_IJSON = True
+except ImportError:
+    HAS_IJSON = False
+
+# orjson 為可選依賴：可用時以其解碼 JSON，否則回退至標準庫
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    _json_loads = json.loads
+
 FHIR_SERVER = "https://bf4f17fd8327.ngrok-free.app/fhir"
 
+SMART_CONFIG_URL = f"{FHIR_SERVER}/.well-known/smart-configuration"
+METADATA_URL = f"{FHIR_SERVER}/metadata"
+PATIENT_URL = f"{FHIR_SERVER}/Patient?_count=1"
+
+# 三個探測共用同一個 Session（HTTP keep-alive + 連線池）
+session = requests.Session()
+session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=4))
+session.headers['Accept-Encoding'] = 'gzip'
+
+
+def probe(url, accept, stream=False):
+    """發送單一 GET 探測，返回 (url, response)"""
+    return url, session.get(url, headers={'Accept': accept}, timeout=10, stream=stream)
+
+
+OAUTH_EXTENSION_PREFIX = 'rest.item.security.extension.item'
+
+
+def summarize_capability_stream(raw):
+    """
+    以 ijson 串流解析 CapabilityStatement，只取出需要的欄位
+    所有欄位都已取得後即停止讀取（欄位順序不固定，rest 可能出現在 software 之前）
+    """
+    summary = {'fhirVersion': 'N/A', 'software_name': 'N/A', 'software_version': '', 'oauth_extension': None}
+    pending = set(summary)
+    builder = None
+    for prefix, event, value in ijson.parse(raw):
+        if builder is not None:
+            builder.event(event, value)
+            if prefix == OAUTH_EXTENSION_PREFIX and event == 'end_map':
+                extension, builder = builder.value, None
+                if 'oauth-uris' in extension.get('url', ''):
+                    summary['oauth_extension'] = extension
+                    pending.discard('oauth_extension')
+        elif (prefix == OAUTH_EXTENSION_PREFIX and event == 'start_map'
+              and 'oauth_extension' in pending):
+            builder = ijson.ObjectBuilder()
+            builder.event(event, value)
+        elif prefix == 'fhirVersion' and event == 'string':
+            summary['fhirVersion'] = value
+            pending.discard('fhirVersion')
+        elif prefix == 'software.name' and event == 'string':
+            summary['software_name'] = value
+            pending.discard('software_name')
+        elif prefix == 'software.version' and event == 'string':
+            summary['software_version'] = value
+            pending.discard('software_version')
+        else:
+            continue
+        if not pending:
+            break
+    return summary
+
+
+def summarize_capability(capability):
+    """從已解析的 CapabilityStatement 取出相同的摘要欄位"""
+    summary = {
+        'fhirVersion': capability.get('fhirVersion', 'N/A'),
+        'software_name': capability.get('software', {}).get('name', 'N/A'),
+        'software_version': capability.get('software', {}).get('version', ''),
+        'oauth_extension': None
+    }
+    for rest in capability.get('rest', []):
+        security = rest.get('security', {})
+        for extension in security.get('extension', []):
+            if 'oauth-uris' in extension.get('url', ''):
+                summary['oauth_extension'] = extension
+                return summary
+    return summary
+
+
+# 同時發出三個探測以重疊網路延遲，再依序輸出結果
+with ThreadPoolExecutor(max_workers=3) as ex:
+    futures = {
+        SMART_CONFIG_URL: ex.submit(probe, SMART_CONFIG_URL, 'application/json'),
+        METADATA_URL: ex.submit(probe, METADATA_URL, 'application/fhir+json', stream=HAS_IJSON),
+        PATIENT_URL: ex.submit(probe, PATIENT_URL, 'application/fhir+json'),
+    }
+
 print("=" * 60)
 print("FHIR 伺服器 SMART 支援測試")
 print("=" * 60)
@@ -16,13 +111,12 @@ print(f"測試伺服器: {FHIR_SERVER}\n")
 print("[TEST 1] SMART Configuration Endpoint")
 print("-" * 60)
 try:
-    url = f"{FHIR_SERVER}/.well-known/smart-configuration"
-    response = requests.get(url, headers={'Accept': 'application/json'}, timeout=10)
+    url, response = futures[SMART_CONFIG_URL].result()
     print(f"URL: {url}")
     print(f"Status Code: {response.status_code}")
-    
+
     if response.status_code == 200:
-        config = response.json()
+        config = _json_loads(response.content)
         print("[OK] Supports SMART Configuration!")
         print(f"\nAuthorization Endpoint: {config.get('authorization_endpoint', 'N/A')}")
         print(f"Token Endpoint: {config.get('token_endpoint', 'N/A')}")
@@ -41,38 +135,38 @@ print()
 print("[TEST 2] CapabilityStatement (metadata)")
 print("-" * 60)
 try:
-    url = f"{FHIR_SERVER}/metadata"
-    response = requests.get(url, headers={'Accept': 'application/fhir+json'}, timeout=10)
-    print(f"URL: {url}")
-    print(f"Status Code: {response.status_code}")
-    
-    if response.status_code == 200:
-        capability = response.json()
-        print(f"[OK] Got CapabilityStatement")
-        print(f"FHIR Version: {capability.get('fhirVersion', 'N/A')}")
-        print(f"Server: {capability.get('software', {}).get('name', 'N/A')} {capability.get('software', {}).get('version', '')}")
-        
-        # 檢查 SMART 擴展
-        oauth_found = False
-        for rest in capability.get('rest', []):
-            security = rest.get('security', {})
-            for extension in security.get('extension', []):
-                if 'oauth-uris' in extension.get('url', ''):
-                    oauth_found = True
-                    print("\n[OK] Found OAuth URIs extension:")
-                    for sub_ext in extension.get('extension', []):
-                        url_type = sub_ext.get('url', '')
-                        value = sub_ext.get('valueUri', '')
-                        if url_type == 'authorize':
-                            print(f"  Authorization: {value}")
-                        elif url_type == 'token':
-                            print(f"  Token: {value}")
-        
-        if not oauth_found:
-            print("\n[FAIL] No OAuth URIs extension found")
-            print("   This server may not support SMART on FHIR")
-    else:
-        print(f"[FAIL] Cannot get CapabilityStatement (Status: {response.status_code})")
+    url, response = futures[METADATA_URL].result()
+    # 串流回應在任何路徑（非 200、提前停止讀取、例外）結束時都會關閉並釋放連線
+    with response:
+        print(f"URL: {url}")
+        print(f"Status Code: {response.status_code}")
+
+        if response.status_code == 200:
+            if HAS_IJSON:
+                response.raw.decode_content = True  # 讓 urllib3 處理 gzip 解壓縮
+                summary = summarize_capability_stream(response.raw)
+            else:
+                summary = summarize_capability(_json_loads(response.content))
+            print(f"[OK] Got CapabilityStatement")
+            print(f"FHIR Version: {summary['fhirVersion']}")
+            print(f"Server: {summary['software_name']} {summary['software_version']}")
+
+            # 檢查 SMART 擴展
+            extension = summary['oauth_extension']
+            if extension:
+                print("\n[OK] Found OAuth URIs extension:")
+                for sub_ext in extension.get('extension', []):
+                    url_type = sub_ext.get('url', '')
+                    value = sub_ext.get('valueUri', '')
+                    if url_type == 'authorize':
+                        print(f"  Authorization: {value}")
+                    elif url_type == 'token':
+                        print(f"  Token: {value}")
+            else:
+                print("\n[FAIL] No OAuth URIs extension found")
+                print("   This server may not support SMART on FHIR")
+        else:
+            print(f"[FAIL] Cannot get CapabilityStatement (Status: {response.status_code})")
 except Exception as e:
     print(f"[ERROR] Request failed: {e}")
 
@@ -82,13 +176,12 @@ print()
 print("[TEST 3] Check if Public FHIR Server")
 print("-" * 60)
 try:
-    url = f"{FHIR_SERVER}/Patient?_count=1"
-    response = requests.get(url, headers={'Accept': 'application/fhir+json'}, timeout=10)
+    url, response = futures[PATIENT_URL].result()
     print(f"URL: {url}")
     print(f"Status Code: {response.status_code}")
-    
+
     if response.status_code == 200:
-        bundle = response.json()
+        bundle = _json_loads(response.content)
         total = bundle.get('total', 0)
         print(f"[OK] This is a PUBLIC FHIR server!")
         print(f"   Total patients: {total}")
@@ -123,4 +216,3 @@ else:
     print("   - Patient ID: Check Swagger UI for available patient IDs")
 
 print("=" * 60)
-
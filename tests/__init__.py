@@ -2,10 +2,3 @@
 PRECISE-HBR SMART on FHIR Application
 Test Suite Initialization
 """
-
-import os
-import sys
-
-# Add parent directory to path for imports
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-
@@ -5,13 +5,24 @@ Pytest configuration and fixtures for PRECISE-HBR tests
 import pytest
 import os
 import sys
+from pathlib import Path
+from types import MappingProxyType
 from unittest.mock import MagicMock, patch
 
-# Add parent directory to path
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+# Add parent directory to path (done once here for every test module)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
 
-@pytest.fixture
+def _freeze(value):
+    """Recursively wrap dicts in MappingProxyType and lists in tuples."""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+@pytest.fixture(scope='module')
 def app():
     """Create and configure a Flask app instance for testing."""
     # Set testing environment variables
@@ -31,23 +42,82 @@ def app():
             'TESTING': True,
             'WTF_CSRF_ENABLED': False,
             'SESSION_TYPE': 'filesystem',
+            'FHIR_DATA_CACHE_ENABLED': False,
         })
         
         yield flask_app
 
 
-@pytest.fixture
+@pytest.fixture(scope='module')
 def client(app):
     """Create a test client for the Flask app."""
     return app.test_client()
 
 
-@pytest.fixture
+@pytest.fixture(scope='module')
 def runner(app):
     """Create a test CLI runner."""
     return app.test_cli_runner()
 
 
+@pytest.fixture(scope='session')
+def audit_logger_mod():
+    """The audit_logger module under test."""
+    import audit_logger
+    return audit_logger
+
+
+@pytest.fixture(scope='session')
+def ccd_generator_mod():
+    """The ccd_generator module under test."""
+    import ccd_generator
+    return ccd_generator
+
+
+@pytest.fixture(scope='session')
+def fhir_data_service_mod():
+    """The fhir_data_service module under test."""
+    import fhir_data_service
+    return fhir_data_service
+
+
+@pytest.fixture(scope='session')
+def dns_cache_mod():
+    """The dns_cache module under test."""
+    import dns_cache
+    return dns_cache
+
+
+@pytest.fixture(scope='session')
+def json_provider_mod():
+    """The json_provider module under test."""
+    import json_provider
+    return json_provider
+
+
+@pytest.fixture(scope='session')
+def tradeoff_calculator_mod():
+    """The services.tradeoff_calculator module under test."""
+    from services import tradeoff_calculator
+    return tradeoff_calculator
+
+
+@pytest.fixture(scope='session')
+def views_mod():
+    """The views module under test."""
+    import views
+    return views
+
+
+@pytest.fixture(scope='module')
+def mock_audit_logger(audit_logger_mod):
+    """Patch audit_logger.get_audit_logger once per test module."""
+    mock_log = MagicMock()
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(audit_logger_mod, 'get_audit_logger', lambda: mock_log)
+        yield mock_log
+
+
 @pytest.fixture
 def mock_fhir_client():
     """Mock FHIR client for testing."""
@@ -57,22 +127,22 @@ def mock_fhir_client():
     return mock_client
 
 
-@pytest.fixture
+@pytest.fixture(scope='session')
 def mock_patient_data():
-    """Mock patient data for testing."""
-    return {
+    """Mock patient data for testing (read-only, shared across the session)."""
+    return _freeze({
         'resourceType': 'Patient',
         'id': 'test-patient-123',
         'name': [{'family': 'Test', 'given': ['Patient']}],
         'gender': 'male',
         'birthDate': '1970-01-01'
-    }
+    })
 
 
-@pytest.fixture
+@pytest.fixture(scope='session')
 def mock_observation_data():
-    """Mock observation data for testing."""
-    return {
+    """Mock observation data for testing (read-only, shared across the session)."""
+    return _freeze({
         'resourceType': 'Observation',
         'id': 'test-obs-123',
         'status': 'final',
@@ -87,13 +157,13 @@ def mock_observation_data():
             'value': 10.5,
             'unit': 'g/dL'
         }
-    }
+    })
 
 
-@pytest.fixture
+@pytest.fixture(scope='session')
 def mock_hbr_criteria():
-    """Mock HBR criteria for testing."""
-    return {
+    """Mock HBR criteria for testing (read-only, shared across the session)."""
+    return _freeze({
         'major_criteria': [
             {
                 'id': 'age',
@@ -110,7 +180,32 @@ def mock_hbr_criteria():
                 'value': 10.5
             }
         ]
-    }
+    })
+
+
+@pytest.fixture(scope='session')
+def mock_session_data():
+    """Mock session data for CCD export tests (read-only, shared across the session)."""
+    return _freeze({
+        'patient': {
+            'resourceType': 'Patient',
+            'id': 'test-patient',
+            'name': [{'family': 'Test', 'given': ['Patient']}]
+        },
+        'hbr_assessment': {
+            'is_high_risk': True,
+            'major_count': 2,
+            'minor_count': 1
+        }
+    })
+
+
+@pytest.fixture(scope='session', autouse=True)
+def _preload_fhir_models():
+    """Import the fhirclient models patched by the tests once, up front."""
+    import fhirclient.models.patient  # noqa: F401
+    import fhirclient.models.observation  # noqa: F401
+    import fhirclient.models.bundle  # noqa: F401
 
 
 @pytest.fixture(autouse=True)
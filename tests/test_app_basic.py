@@ -3,6 +3,9 @@ Basic application tests for PRECISE-HBR
 """
 
 import pytest
+from unittest.mock import MagicMock, patch
+
+from cachetools import TTLCache
 
 
 def test_app_exists(app):
@@ -24,13 +27,6 @@ def test_health_endpoint(client):
     assert data['status'] == 'healthy'
 
 
-def test_index_redirect(client):
-    """Test that index redirects to landing page."""
-    response = client.get('/', follow_redirects=False)
-    # Should redirect or return landing page
-    assert response.status_code in [200, 302, 308]
-
-
 def test_cds_services_endpoint(client):
     """Test the CDS services discovery endpoint."""
     response = client.get('/cds-services')
@@ -40,20 +36,6 @@ def test_cds_services_endpoint(client):
     assert isinstance(data['services'], list)
 
 
-def test_launch_endpoint_exists(client):
-    """Test that the launch endpoint exists."""
-    response = client.get('/launch')
-    # May return error without proper parameters, but endpoint should exist
-    assert response.status_code in [200, 302, 400, 500]
-
-
-def test_callback_endpoint_exists(client):
-    """Test that the callback endpoint exists."""
-    response = client.get('/callback')
-    # May return error without proper parameters, but endpoint should exist
-    assert response.status_code in [200, 302, 400, 500]
-
-
 def test_static_files_accessible(client):
     """Test that static files are accessible."""
     response = client.get('/static/favicon.ico')
@@ -67,12 +49,66 @@ def test_cors_headers(client):
     assert response.status_code in [200, 204]
 
 
-def test_security_headers(client):
-    """Test security headers are present."""
-    response = client.get('/')
-    # Check for security headers
-    headers = response.headers
-    # These might be added by Flask-Talisman
-    # Just check response is valid
-    assert response.status_code in [200, 302, 308]
+@pytest.mark.parametrize('endpoint, expected', [
+    # Index should redirect or return landing page
+    ('/', frozenset({200, 302, 308})),
+    # May return error without proper parameters, but endpoint should exist
+    ('/launch', frozenset({200, 302, 400, 500})),
+    ('/callback', frozenset({200, 302, 400, 500})),
+])
+def test_endpoint_reachable(client, endpoint, expected):
+    """Test that core endpoints respond without following redirects."""
+    response = client.get(endpoint, follow_redirects=False)
+    assert response.status_code in expected
+
+
+@pytest.fixture
+def fhir_session(client):
+    """Log the test client into a fake FHIR session."""
+    with client.session_transaction() as sess:
+        sess['fhir_data'] = {
+            'server': 'https://fhir.example.com',
+            'token': 'cache-test-token',
+            'patient': 'cache-test-patient',
+            'client_id': 'test-client-id',
+            'expires_in': 3600,
+        }
+    yield 'cache-test-patient'
+    with client.session_transaction() as sess:
+        sess.clear()
+
+
+@pytest.fixture
+def fhir_data_cache(app, views_mod, monkeypatch):
+    """Enable the FHIR data cache with a mocked get_fhir_data."""
+    mock_get_fhir_data = MagicMock(return_value=({'patient': {'id': 'cache-test-patient'}}, None))
+    monkeypatch.setitem(app.config, 'FHIR_DATA_CACHE_ENABLED', True)
+    monkeypatch.setattr(views_mod, 'get_fhir_data', mock_get_fhir_data)
+    monkeypatch.setattr(views_mod, '_FHIR_DATA_CACHE', TTLCache(maxsize=8, ttl=60))
+    monkeypatch.setattr(views_mod, '_PREFETCH_FUTURES', TTLCache(maxsize=8, ttl=30))
+    # 只驗證 FHIR 查詢次數，分數計算以固定值替代
+    with patch.multiple('fhir_data_service',
+                        get_patient_demographics=MagicMock(return_value={}),
+                        calculate_precise_hbr_score=MagicMock(return_value=([], 0)),
+                        get_precise_hbr_display_info=MagicMock(return_value={})):
+        yield mock_get_fhir_data
+
+
+def test_calculate_risk_post_uses_cache(client, fhir_session, fhir_data_cache):
+    """Test a repeated risk POST is served from the FHIR data cache."""
+    for _ in range(2):
+        response = client.post('/api/calculate_risk', json={'patientId': fhir_session},
+                               base_url='https://localhost')
+        assert response.status_code == 200
+
+    fhir_data_cache.assert_called_once()
+
+
+def test_risk_post_consumes_main_page_prefetch(client, fhir_session, fhir_data_cache):
+    """Test the page's risk POST reuses the fetch started when /main rendered."""
+    assert client.get('/main', base_url='https://localhost').status_code == 200
+    response = client.post('/api/calculate_risk', json={'patientId': fhir_session},
+                           base_url='https://localhost')
 
+    assert response.status_code == 200
+    fhir_data_cache.assert_called_once()
@@ -3,52 +3,37 @@ Tests for audit logging functionality
 """
 
 import pytest
-from unittest.mock import Mock, patch
-import sys
-import os
 
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-import audit_logger
-
-
-def test_audit_logger_initialization():
+def test_audit_logger_initialization(audit_logger_mod):
     """Test audit logger can be initialized."""
-    logger = audit_logger.get_audit_logger()
+    logger = audit_logger_mod.get_audit_logger()
     assert logger is not None
 
 
-def test_audit_ephi_access():
+def test_audit_ephi_access(audit_logger_mod, mock_audit_logger):
     """Test ePHI access logging."""
-    with patch('audit_logger.get_audit_logger') as mock_logger:
-        mock_log = Mock()
-        mock_logger.return_value = mock_log
-        
-        audit_logger.audit_ephi_access(
-            user_id='test-user',
-            patient_id='test-patient',
-            action='view',
-            resource_type='Patient'
-        )
-        
-        # Should call logger
-        assert mock_log.info.called or mock_log.warning.called or True
+    audit_logger_mod.audit_ephi_access(
+        user_id='test-user',
+        patient_id='test-patient',
+        action='view',
+        resource_type='Patient'
+    )
+    
+    # Should call logger
+    assert mock_audit_logger.info.called or mock_audit_logger.warning.called or True
 
 
-def test_user_authentication_logging():
+def test_user_authentication_logging(audit_logger_mod, mock_audit_logger):
     """Test user authentication logging."""
-    with patch('audit_logger.get_audit_logger') as mock_logger:
-        mock_log = Mock()
-        mock_logger.return_value = mock_log
-        
-        audit_logger.log_user_authentication(
-            user_id='test-user',
-            success=True,
-            ip_address='127.0.0.1'
-        )
-        
-        # Should call logger
-        assert True  # Basic test to ensure no exceptions
+    audit_logger_mod.log_user_authentication(
+        user_id='test-user',
+        success=True,
+        ip_address='127.0.0.1'
+    )
+    
+    # Should call logger
+    assert True  # Basic test to ensure no exceptions
 
 
 def test_audit_log_format():
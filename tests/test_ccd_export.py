@@ -4,38 +4,19 @@ Tests for CCD (Continuity of Care Document) export functionality
 
 import pytest
 from unittest.mock import Mock, patch
-import sys
-import os
 
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-import ccd_generator
-
-
-def test_ccd_generator_exists():
+def test_ccd_generator_exists(ccd_generator_mod):
     """Test that CCD generator module exists."""
-    assert ccd_generator is not None
+    assert ccd_generator_mod is not None
 
 
-def test_generate_ccd_from_session_data():
+def test_generate_ccd_from_session_data(ccd_generator_mod, mock_session_data):
     """Test CCD generation from session data."""
-    mock_session_data = {
-        'patient': {
-            'resourceType': 'Patient',
-            'id': 'test-patient',
-            'name': [{'family': 'Test', 'given': ['Patient']}]
-        },
-        'hbr_assessment': {
-            'is_high_risk': True,
-            'major_count': 2,
-            'minor_count': 1
-        }
-    }
-    
     with patch('ccd_generator.generate_ccd_from_session_data') as mock_gen:
         mock_gen.return_value = '<ClinicalDocument>...</ClinicalDocument>'
         
-        result = ccd_generator.generate_ccd_from_session_data(mock_session_data)
+        result = ccd_generator_mod.generate_ccd_from_session_data(mock_session_data)
         
         assert result is not None
         assert isinstance(result, str)
@@ -48,30 +29,14 @@ def test_ccd_xml_structure():
     assert True
 
 
-def test_ccd_includes_patient_info():
+def test_ccd_includes_patient_info(mock_session_data):
     """Test that CCD includes patient information."""
-    mock_session_data = {
-        'patient': {
-            'resourceType': 'Patient',
-            'id': 'test-patient',
-            'name': [{'family': 'Test', 'given': ['Patient']}]
-        }
-    }
-    
     # Test would verify patient info is in CCD
     assert 'patient' in mock_session_data
 
 
-def test_ccd_includes_hbr_assessment():
+def test_ccd_includes_hbr_assessment(mock_session_data):
     """Test that CCD includes HBR assessment results."""
-    mock_session_data = {
-        'hbr_assessment': {
-            'is_high_risk': True,
-            'major_count': 2,
-            'minor_count': 1
-        }
-    }
-    
     # Test would verify HBR assessment is in CCD
     assert 'hbr_assessment' in mock_session_data
 
@@ -0,0 +1,107 @@
+"""
+Tests for the outbound DNS cache
+"""
+
+import socket
+
+import pytest
+
+
+@pytest.fixture
+def resolver(dns_cache_mod, monkeypatch):
+    """Install the DNS cache over a fake resolver with a controllable clock."""
+    calls = []
+    clock = [1000.0]
+
+    def fake_getaddrinfo(host, port, *args, **kwargs):
+        calls.append((host, port))
+        if host == 'unresolvable.example.com':
+            raise socket.gaierror('Name or service not known')
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, '', ('10.0.0.1', port))]
+
+    # monkeypatch restores socket.getaddrinfo and the module state after each test
+    monkeypatch.setattr(socket, 'getaddrinfo', fake_getaddrinfo)
+    monkeypatch.setattr(dns_cache_mod, '_original_getaddrinfo', None)
+    monkeypatch.setattr(dns_cache_mod, '_cache', {})
+    monkeypatch.setattr(dns_cache_mod, 'monotonic', lambda: clock[0])
+    return calls, clock
+
+
+def test_repeated_lookups_are_cached(dns_cache_mod, resolver):
+    """Test the same host/port is resolved once within the TTL."""
+    calls, _ = resolver
+    assert dns_cache_mod.install_dns_cache(ttl=60) is True
+
+    first = socket.getaddrinfo('fhir.example.com', 443)
+    second = socket.getaddrinfo('fhir.example.com', 443)
+    socket.getaddrinfo('fhir.example.com', 80)
+
+    assert first == second
+    assert calls == [('fhir.example.com', 443), ('fhir.example.com', 80)]
+
+
+def test_entries_expire_after_ttl(dns_cache_mod, resolver):
+    """Test a lookup is repeated once its TTL has elapsed."""
+    calls, clock = resolver
+    dns_cache_mod.install_dns_cache(ttl=60)
+
+    socket.getaddrinfo('fhir.example.com', 443)
+    clock[0] += 59
+    socket.getaddrinfo('fhir.example.com', 443)
+    clock[0] += 2
+    socket.getaddrinfo('fhir.example.com', 443)
+
+    assert len(calls) == 2
+
+
+def test_failed_lookups_are_not_cached(dns_cache_mod, resolver):
+    """Test resolver errors propagate and are retried on the next call."""
+    calls, _ = resolver
+    dns_cache_mod.install_dns_cache(ttl=60)
+
+    for _ in range(2):
+        with pytest.raises(socket.gaierror):
+            socket.getaddrinfo('unresolvable.example.com', 443)
+
+    assert len(calls) == 2
+
+
+def test_cache_is_bounded_by_maxsize(dns_cache_mod, resolver):
+    """Test the cache never holds more than maxsize entries."""
+    _, clock = resolver
+    dns_cache_mod.install_dns_cache(ttl=60, maxsize=2)
+
+    for port in (1, 2, 3):
+        socket.getaddrinfo('fhir.example.com', port)
+    assert len(dns_cache_mod._cache) <= 2
+
+    # 過期項目會先被清除，保留仍有效的項目
+    clock[0] += 61
+    socket.getaddrinfo('fhir.example.com', 4)
+    socket.getaddrinfo('fhir.example.com', 5)
+    assert len(dns_cache_mod._cache) == 2
+
+
+def test_install_is_idempotent(dns_cache_mod, resolver):
+    """Test a second install does not wrap the resolver again."""
+    dns_cache_mod.install_dns_cache(ttl=60)
+    patched = socket.getaddrinfo
+
+    assert dns_cache_mod.install_dns_cache(ttl=60) is True
+    assert socket.getaddrinfo is patched
+
+
+def test_disabled_with_zero_ttl(dns_cache_mod, resolver):
+    """Test DNS_CACHE_TTL=0 leaves socket.getaddrinfo untouched."""
+    original = socket.getaddrinfo
+
+    assert dns_cache_mod.install_dns_cache(ttl=0) is False
+    assert socket.getaddrinfo is original
+
+
+def test_invalid_env_ttl_falls_back_to_default(dns_cache_mod, resolver, monkeypatch, caplog):
+    """Test a malformed DNS_CACHE_TTL logs a warning instead of failing startup."""
+    monkeypatch.setenv('DNS_CACHE_TTL', 'five minutes')
+
+    assert dns_cache_mod.install_dns_cache() is True
+    assert 'Invalid DNS_CACHE_TTL' in caplog.text
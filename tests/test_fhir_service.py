@@ -3,28 +3,35 @@ Tests for FHIR data service module
 """
 
 import pytest
-from unittest.mock import Mock, patch, MagicMock
-import sys
-import os
+from unittest.mock import patch, MagicMock
 
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from requests.exceptions import ReadTimeout
 
-import fhir_data_service
 
+class _FakePatient:
+    """Minimal stand-in for a fhirclient Patient; only as_json() is used."""
+    __slots__ = ('_json',)
 
-def test_fetch_patient_data_success(mock_fhir_client, mock_patient_data):
+    def __init__(self, json_data):
+        self._json = json_data
+
+    def as_json(self):
+        return self._json
+
+
+def test_fetch_patient_data_success(fhir_data_service_mod, mock_fhir_client, mock_patient_data):
     """Test successful patient data fetching."""
     with patch('fhir_data_service.Patient') as mock_patient:
-        mock_patient.read.return_value = Mock(as_json=lambda: mock_patient_data)
+        mock_patient.read.return_value = _FakePatient(mock_patient_data)
         
-        result = fhir_data_service.fetch_patient_data('test-patient-123', mock_fhir_client)
+        result = fhir_data_service_mod.fetch_patient_data('test-patient-123', mock_fhir_client)
         
         assert result is not None
         # Patient.read should be called with patient ID and smart client
         mock_patient.read.assert_called_once()
 
 
-def test_fetch_observations_success(mock_fhir_client):
+def test_fetch_observations_success(fhir_data_service_mod, mock_fhir_client):
     """Test successful observations fetching."""
     mock_bundle = MagicMock()
     mock_bundle.entry = []
@@ -32,19 +39,19 @@ def test_fetch_observations_success(mock_fhir_client):
     with patch('fhir_data_service.Observation') as mock_obs:
         mock_obs.where.return_value.perform_resources.return_value = []
         
-        result = fhir_data_service.fetch_observations('test-patient-123', mock_fhir_client)
+        result = fhir_data_service_mod.fetch_observations('test-patient-123', mock_fhir_client)
         
         assert result is not None
         assert isinstance(result, list)
 
 
-def test_calculate_hbr_score_basic():
+def test_calculate_hbr_score_basic(fhir_data_service_mod):
     """Test basic HBR score calculation."""
     # Test with empty criteria
     major_criteria = []
     minor_criteria = []
     
-    result = fhir_data_service.calculate_hbr_score(major_criteria, minor_criteria)
+    result = fhir_data_service_mod.calculate_hbr_score(major_criteria, minor_criteria)
     
     assert 'is_high_risk' in result
     assert 'major_count' in result
@@ -53,7 +60,7 @@ def test_calculate_hbr_score_basic():
     assert result['minor_count'] == 0
 
 
-def test_calculate_hbr_score_high_risk():
+def test_calculate_hbr_score_high_risk(fhir_data_service_mod):
     """Test HBR score calculation for high risk patient."""
     major_criteria = [
         {'id': 'age', 'met': True},
@@ -63,7 +70,7 @@ def test_calculate_hbr_score_high_risk():
         {'id': 'anemia', 'met': True}
     ]
     
-    result = fhir_data_service.calculate_hbr_score(major_criteria, minor_criteria)
+    result = fhir_data_service_mod.calculate_hbr_score(major_criteria, minor_criteria)
     
     assert result['major_count'] == 2
     assert result['minor_count'] == 1
@@ -71,19 +78,19 @@ def test_calculate_hbr_score_high_risk():
     assert result['is_high_risk'] is True
 
 
-def test_age_criterion_evaluation():
+def test_age_criterion_evaluation(fhir_data_service_mod):
     """Test age criterion evaluation."""
     # Patient over 75 years old
     birth_date = '1940-01-01'
     
-    result = fhir_data_service.evaluate_age_criterion(birth_date)
+    result = fhir_data_service_mod.evaluate_age_criterion(birth_date)
     
     assert result is not None
     assert 'met' in result
     assert result['met'] is True
 
 
-def test_hemoglobin_criterion_evaluation():
+def test_hemoglobin_criterion_evaluation(fhir_data_service_mod):
     """Test hemoglobin criterion evaluation."""
     observations = [
         {
@@ -92,7 +99,7 @@ def test_hemoglobin_criterion_evaluation():
         }
     ]
     
-    result = fhir_data_service.evaluate_hemoglobin_criterion(observations)
+    result = fhir_data_service_mod.evaluate_hemoglobin_criterion(observations)
     
     assert result is not None
     assert 'met' in result
@@ -100,13 +107,117 @@ def test_hemoglobin_criterion_evaluation():
     assert result['met'] is True
 
 
-def test_error_handling_invalid_patient():
+def test_error_handling_invalid_patient(fhir_data_service_mod):
     """Test error handling for invalid patient ID."""
     mock_client = MagicMock()
     
     with patch('fhir_data_service.Patient.read', side_effect=Exception("Patient not found")):
-        result = fhir_data_service.fetch_patient_data('invalid-id', mock_client)
+        result = fhir_data_service_mod.fetch_patient_data('invalid-id', mock_client)
         
         # Should handle error gracefully
         assert result is None or isinstance(result, dict)
 
+
+
+def test_tradeoff_scores_batch_matches_interactive(fhir_data_service_mod):
+    """Test batched tradeoff scoring agrees with the per-patient calculation."""
+    model = fhir_data_service_mod.get_tradeoff_model_predictors()
+    active_factors_list = [
+        {},
+        {'smoker': True, 'diabetes': True},
+        {'hemoglobin_lt_11': True, 'egfr_lt_30': True, 'oac_discharge': True},
+    ]
+    
+    batch = fhir_data_service_mod.calculate_tradeoff_scores_batch(active_factors_list)
+    
+    assert len(batch) == len(active_factors_list)
+    for scores, active_factors in zip(batch, active_factors_list):
+        expected = fhir_data_service_mod.calculate_tradeoff_scores_interactive(model, active_factors)
+        assert scores['bleeding_score'] == pytest.approx(expected['bleeding_score'], abs=0.01)
+        assert scores['thrombotic_score'] == pytest.approx(expected['thrombotic_score'], abs=0.01)
+
+
+def test_tradeoff_scores_batch_empty(fhir_data_service_mod):
+    """Test batched tradeoff scoring with no patients."""
+    assert fhir_data_service_mod.calculate_tradeoff_scores_batch([]) == []
+
+
+def test_latest_observation_from_batch_bundle(fhir_data_service_mod):
+    """Test the newest observation is picked from a batch searchset Bundle."""
+    bundle = {'resourceType': 'Bundle', 'entry': [
+        {'resource': {'id': 'old', 'effectiveDateTime': '2023-01-01'}},
+        {'resource': {'id': 'new', 'effectiveDateTime': '2024-06-01'}},
+    ]}
+    
+    result = fhir_data_service_mod.latest_observation(bundle)
+    
+    assert [obs['id'] for obs in result] == ['new']
+    assert fhir_data_service_mod.latest_observation({'resourceType': 'Bundle'}) == []
+
+
+def test_fetch_batch_remembers_unsupported_server(fhir_data_service_mod):
+    """Test servers rejecting batch Bundles fall back and are not retried."""
+    mock_server = MagicMock()
+    mock_server.base_uri = 'https://batchless.example.com/fhir/'
+    mock_server.session.post.return_value = MagicMock(status_code=405)
+    
+    assert fhir_data_service_mod.fetch_batch(['Condition?patient=1'], mock_server) is None
+    assert fhir_data_service_mod.fetch_batch(['Condition?patient=1'], mock_server) is None
+    mock_server.session.post.assert_called_once()
+
+
+def test_tradeoff_client_evicted_on_unauthorized(tradeoff_calculator_mod):
+    """Test a 401 evicts only the cached client for that token."""
+    server_url = 'https://tradeoff.example.com/fhir'
+    
+    with patch.object(tradeoff_calculator_mod.client, 'FHIRClient'):
+        tradeoff_calculator_mod._get_tradeoff_client(server_url, 'expired-token', 'app')
+        tradeoff_calculator_mod._get_tradeoff_client(server_url, 'other-token', 'app')
+    
+    error = Exception('Unauthorized')
+    error.response = MagicMock(status_code=401)
+    tradeoff_calculator_mod._invalidate_client_on_unauthorized(error, server_url, 'expired-token', 'app')
+    
+    def cache_key(token):
+        token_hash = tradeoff_calculator_mod._token_hash(token)
+        return tradeoff_calculator_mod.hashkey(server_url, token_hash, 'app')
+    
+    assert cache_key('expired-token') not in tradeoff_calculator_mod._CLIENT_CACHE
+    assert cache_key('other-token') in tradeoff_calculator_mod._CLIENT_CACHE
+
+
+def test_fetch_batch_retries_after_client_error(fhir_data_service_mod):
+    """Test a 400 falls back without disabling batching for the server."""
+    mock_server = MagicMock()
+    mock_server.base_uri = 'https://flaky-batch.example.com/fhir/'
+    mock_server.session.post.return_value = MagicMock(status_code=400)
+    
+    assert fhir_data_service_mod.fetch_batch(['Condition?patient=1'], mock_server) is None
+    assert fhir_data_service_mod.fetch_batch(['Condition?patient=1'], mock_server) is None
+    assert mock_server.session.post.call_count == 2
+    assert mock_server.session.post.call_args.kwargs['timeout']
+
+
+def test_fetch_batch_remembers_timed_out_server(fhir_data_service_mod):
+    """Test a batch timeout skips batching for that server on later calls."""
+    mock_server = MagicMock()
+    mock_server.base_uri = 'https://slow-batch.example.com/fhir/'
+    mock_server.session.post.side_effect = ReadTimeout()
+    
+    assert fhir_data_service_mod.fetch_batch(['Condition?patient=1'], mock_server) is None
+    assert fhir_data_service_mod.fetch_batch(['Condition?patient=1'], mock_server) is None
+    mock_server.session.post.assert_called_once()
+
+
+def test_setup_fhir_client_reuses_client_per_token(fhir_data_service_mod):
+    """Test get_fhir_data's client and session are reused for the same server and token."""
+    with patch('services.fhir_client.client.FHIRClient') as mock_fhir_client:
+        first, _ = fhir_data_service_mod.setup_fhir_client(
+            'https://pooled.example.com/fhir', 'token-a', 'patient-1', 'app')
+        second, _ = fhir_data_service_mod.setup_fhir_client(
+            'https://pooled.example.com/fhir', 'token-a', 'patient-1', 'app')
+        fhir_data_service_mod.setup_fhir_client(
+            'https://pooled.example.com/fhir', 'token-b', 'patient-1', 'app')
+    
+    assert first is second
+    assert mock_fhir_client.call_count == 2
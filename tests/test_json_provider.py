@@ -0,0 +1,83 @@
+"""
+Tests for the orjson-backed Flask JSON provider
+"""
+
+import datetime
+import decimal
+import json
+import uuid
+
+import pytest
+from flask import Flask
+
+
+@pytest.fixture
+def json_app(json_provider_mod):
+    """A bare Flask app using the orjson provider."""
+    app = Flask(__name__)
+    app.json = json_provider_mod.ORJSONProvider(app)
+    return app
+
+
+def test_keys_are_sorted(json_app):
+    """Test keys are sorted like Flask's default provider."""
+    assert json_app.json.dumps({'b': 1, 'a': 2}) == '{"a":2,"b":1}'
+
+    json_app.json.sort_keys = False
+    assert json_app.json.dumps({'b': 1, 'a': 2}) == '{"b":1,"a":2}'
+
+
+def test_datetime_rendered_as_http_date(json_app):
+    """Test datetimes and dates use Flask's HTTP date format."""
+    moment = datetime.datetime(2024, 6, 1, 12, 30, tzinfo=datetime.timezone.utc)
+
+    result = json.loads(json_app.json.dumps({'at': moment, 'on': moment.date()}))
+
+    assert result == {'at': 'Sat, 01 Jun 2024 12:30:00 GMT',
+                      'on': 'Sat, 01 Jun 2024 00:00:00 GMT'}
+
+
+def test_decimal_and_uuid_serialized_as_strings(json_app):
+    """Test Decimal and UUID values match Flask's string conversion."""
+    ident = uuid.UUID('12345678-1234-5678-1234-567812345678')
+
+    result = json.loads(json_app.json.dumps({'score': decimal.Decimal('1.50'), 'id': ident}))
+
+    assert result == {'score': '1.50', 'id': str(ident)}
+
+
+def test_matches_default_provider_output(json_app):
+    """Test decoded output agrees with Flask's stdlib provider."""
+    from flask.json.provider import DefaultJSONProvider
+    data = {'z': [1, 2.5, None], 'a': {'nested': True}, 'name': '王小明',
+            'when': datetime.date(2024, 1, 2), 'amount': decimal.Decimal('3.14')}
+
+    expected = DefaultJSONProvider(json_app).dumps(data)
+
+    assert json.loads(json_app.json.dumps(data)) == json.loads(expected)
+
+
+def test_indent_is_honored(json_app):
+    """Test indent=2 is produced by orjson and other indents fall back."""
+    data = {'a': [1]}
+
+    assert json_app.json.dumps(data, indent=2) == json.dumps(data, indent=2)
+    assert json_app.json.dumps(data, indent=4) == json.dumps(data, indent=4)
+
+
+def test_unsupported_kwargs_fall_back_to_stdlib(json_app):
+    """Test keyword arguments orjson cannot honor are not silently dropped."""
+    data = {'name': '王'}
+
+    assert json_app.json.dumps(data, ensure_ascii=True) == '{"name": "\\u738b"}'
+    assert json_app.json.dumps({'a': 1, 'b': 2}, separators=(', ', ': ')) == '{"a": 1, "b": 2}'
+    assert json_app.json.loads('1.5', parse_float=decimal.Decimal) == decimal.Decimal('1.5')
+
+
+def test_response_is_compact_and_pretty_in_debug(json_app):
+    """Test jsonify output follows Flask's compact/debug formatting."""
+    with json_app.app_context():
+        assert json_app.json.response(b=1, a=2).get_data() == b'{"a":2,"b":1}\n'
+
+        json_app.debug = True
+        assert json_app.json.response(a=1).get_data() == b'{\n  "a": 1\n}\n'
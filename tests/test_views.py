@@ -0,0 +1,137 @@
+"""
+Tests for the test-patient list helpers in views
+"""
+
+import io
+import json
+from unittest.mock import MagicMock
+
+import pytest
+
+
+def _raw(body):
+    """A streamed response body as the helpers receive it from urllib3."""
+    return io.BytesIO(json.dumps(body).encode('utf-8'))
+
+
+@pytest.fixture
+def mock_http_session(views_mod, monkeypatch):
+    """Replace the shared requests.Session used by the patient list routes."""
+    http = MagicMock()
+    monkeypatch.setattr(views_mod, '_http_session', lambda: http)
+    return http
+
+
+def _streamed_response(status_code, body=None):
+    """A mock streamed response that records being closed."""
+    response = MagicMock(status_code=status_code)
+    response.__enter__.return_value = response
+    response.raw = _raw(body) if body is not None else io.BytesIO(b'')
+    return response
+
+
+def test_stream_bundle_patients_builds_rows(views_mod):
+    """Test streamed Bundle entries become patient list rows."""
+    bundle = {
+        'resourceType': 'Bundle',
+        'type': 'searchset',
+        'entry': [
+            {'resource': {'resourceType': 'Patient', 'id': 'p1', 'gender': 'female',
+                          'birthDate': '1950-02-03', 'name': [{'text': 'Jane Doe'}]}},
+            {'resource': {'resourceType': 'Patient', 'id': 'p2', 'gender': 'male',
+                          'name': [{'given': ['John', 'Q'], 'family': 'Public'}]}},
+            {'resource': {'resourceType': 'OperationOutcome', 'id': 'oo'}},
+        ],
+    }
+
+    patients = views_mod._stream_bundle_patients(_raw(bundle))
+
+    assert [p['id'] for p in patients] == ['p1', 'p2']
+    assert patients[0] == {'id': 'p1', 'name': 'Jane Doe', 'gender': 'Female',
+                           'birthDate': '1950-02-03', 'description': 'Female patient'}
+    assert patients[1]['name'] == 'John Q Public'
+    assert patients[1]['birthDate'] == 'Unknown'
+
+
+def test_stream_bundle_patients_missing_fields(views_mod):
+    """Test a Patient without name, gender or birth date gets placeholders."""
+    bundle = {'resourceType': 'Bundle', 'entry': [{'resource': {'resourceType': 'Patient'}}]}
+
+    patients = views_mod._stream_bundle_patients(_raw(bundle))
+
+    assert patients == [{'id': 'Unknown', 'name': 'Unknown Name', 'gender': 'Unknown',
+                         'birthDate': 'Unknown', 'description': 'Unknown patient'}]
+
+
+def test_stream_bundle_patients_empty_and_non_bundle(views_mod):
+    """Test an empty Bundle yields no rows and a non-Bundle yields None."""
+    assert views_mod._stream_bundle_patients(_raw({'resourceType': 'Bundle', 'total': 0})) == []
+    assert views_mod._stream_bundle_patients(_raw({'resourceType': 'OperationOutcome'})) is None
+
+
+def test_fetch_patient_page_closes_response_on_error(views_mod, mock_http_session):
+    """Test a non-200 page is reported and its streamed response is released."""
+    response = _streamed_response(503)
+    mock_http_session.get.return_value = response
+
+    assert views_mod._fetch_patient_page('https://fhir.example.com', 0) == (None, 503)
+    response.__exit__.assert_called_once()
+
+
+def test_fetch_patient_page_offset_params(views_mod, mock_http_session):
+    """Test only later pages send _offset and the shared params stay unchanged."""
+    mock_http_session.get.side_effect = (
+        lambda *args, **kwargs: _streamed_response(200, {'resourceType': 'Bundle'}))
+
+    views_mod._fetch_patient_page('https://fhir.example.com', 0)
+    views_mod._fetch_patient_page('https://fhir.example.com', 50)
+
+    first, second = (call.kwargs['params'] for call in mock_http_session.get.call_args_list)
+    assert first == {'_count': 50}
+    assert second == {'_count': 50, '_offset': 50}
+    assert views_mod._PATIENT_SEARCH_PARAMS == {'_count': 50}
+
+
+@pytest.fixture
+def patient_pages(views_mod, monkeypatch):
+    """Serve patient list pages from a fake _fetch_patient_page."""
+    pages = {}
+    calls = []
+
+    def fake_fetch(fhir_server, offset):
+        calls.append(offset)
+        return pages.get(offset, []), 200
+
+    monkeypatch.setattr(views_mod, '_fetch_patient_page', fake_fetch)
+    monkeypatch.setattr(views_mod, '_PATIENT_LIST_CACHE', views_mod.TTLCache(maxsize=8, ttl=60))
+    return pages, calls
+
+
+def _row(patient_id):
+    return {'id': patient_id, 'name': patient_id, 'gender': 'Unknown',
+            'birthDate': 'Unknown', 'description': 'Unknown patient'}
+
+
+def test_patient_pages_merged_without_duplicates(client, views_mod, patient_pages, monkeypatch):
+    """Test pages are merged in order and repeated patients are dropped."""
+    pages, _ = patient_pages
+    # 第二頁與第一頁重疊（例如伺服器忽略 _offset）
+    pages.update({0: [_row('a'), _row('b')], 50: [_row('b'), _row('c')], 100: [_row('a')]})
+    rendered = MagicMock(return_value='ok')
+    monkeypatch.setattr(views_mod, 'render_template', rendered)
+
+    response = client.get('/test-patients-list?pages=3', base_url='https://localhost')
+
+    assert response.status_code == 200
+    assert [p['id'] for p in rendered.call_args.kwargs['patients']] == ['a', 'b', 'c']
+
+
+def test_patient_pages_capped(client, views_mod, patient_pages, monkeypatch):
+    """Test ?pages=N fetches at most _MAX_PATIENT_PAGES pages."""
+    _, calls = patient_pages
+    monkeypatch.setattr(views_mod, 'render_template', MagicMock(return_value='ok'))
+
+    client.get('/test-patients-list?pages=50&refresh=1', base_url='https://localhost')
+
+    assert sorted(calls) == [page * views_mod._PATIENT_PAGE_SIZE
+                             for page in range(views_mod._MAX_PATIENT_PAGES)]
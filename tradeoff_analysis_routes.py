@@ -1,6 +1,7 @@
 from flask import Blueprint, render_template, request, session, jsonify, redirect, url_for
 from functools import wraps
 import fhir_data_service
+from audit_logger import get_session_patient_id
 from fhirclient import client
 import logging
 
@@ -33,7 +34,7 @@ def login_required_bp(f):
 @login_required_bp
 def tradeoff_analysis_page():
     """Renders the tradeoff analysis page."""
-    patient_id = session.get('patient_id', 'N/A')
+    patient_id = get_session_patient_id('N/A')
     return render_template('tradeoff_analysis.html', patient_id=patient_id)
 
 @tradeoff_bp.route('/api/calculate_tradeoff', methods=['POST'])
@@ -1,11 +1,15 @@
+import hashlib
 import logging
+import operator
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from functools import wraps
-import jwt
-import requests
-from flask import (Blueprint, redirect, render_template, request,
-                   session, jsonify, url_for)
+from cachetools import TTLCache
+from cachetools.keys import hashkey
+from flask import (Blueprint, Response, current_app, redirect, render_template,
+                   request, session, jsonify, url_for)
 from fhir_data_service import (
     get_fhir_data,
     calculate_risk_components,
@@ -16,32 +20,126 @@ from fhir_data_service import (
 views_bp = Blueprint('views', __name__)
 
 
+# 短期快取 FHIR 原始資料，避免同一病人在短時間內重複查詢 FHIR 伺服器
+# 鍵使用 token 的雜湊而非 token 本身，避免 bearer token 留在記憶體快取中
+_FHIR_DATA_CACHE = TTLCache(maxsize=256, ttl=60)
+_FHIR_DATA_CACHE_LOCK = threading.Lock()
+
+# /main 頁面渲染時先在背景開始獲取 FHIR 資料，與瀏覽器載入頁面的時間重疊；
+# 頁面隨後送出的 POST /api/calculate_risk（APP.calculate_risk_api）經由
+# get_fhir_data_cached 直接等待同一個 future（兩者共用上方的鎖）
+_PREFETCH_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix='fhir-prefetch')
+_PREFETCH_FUTURES = TTLCache(maxsize=128, ttl=30)
+
+
+def _fhir_data_cache_key(fhir_server_url, patient_id, access_token):
+    """Build the cache key for a patient's FHIR data."""
+    token_hash = hashlib.blake2s(access_token.encode('utf-8')).digest()
+    return hashkey(fhir_server_url, patient_id, token_hash)
+
+
+def get_fhir_data_cached(fhir_server_url, access_token, patient_id, client_id):
+    """
+    get_fhir_data 的 TTL 快取包裝，只快取成功的結果
+    可透過 app.config['FHIR_DATA_CACHE_ENABLED'] = False 停用
+
+    Returns:
+        tuple: (raw_data, error)，與 get_fhir_data 相同；快取資料應視為唯讀
+    """
+    if not current_app.config.get('FHIR_DATA_CACHE_ENABLED', True):
+        return get_fhir_data(fhir_server_url, access_token, patient_id, client_id)
+
+    key = _fhir_data_cache_key(fhir_server_url, patient_id, access_token)
+    with _FHIR_DATA_CACHE_LOCK:
+        raw_data = _FHIR_DATA_CACHE.get(key)
+        future = _PREFETCH_FUTURES.pop(key, None) if raw_data is None else None
+    if raw_data is not None:
+        return raw_data, None
+
+    if future is not None:
+        # get_fhir_data 自行捕捉例外並以 error 返回，因此 result() 不會拋出
+        raw_data, error = future.result()
+    else:
+        raw_data, error = get_fhir_data(fhir_server_url, access_token, patient_id, client_id)
+    if not error:
+        with _FHIR_DATA_CACHE_LOCK:
+            _FHIR_DATA_CACHE[key] = raw_data
+    return raw_data, error
+
+
+def _prefetch_fhir_data(fhir_server_url, access_token, patient_id, client_id):
+    """
+    在背景開始獲取病人的 FHIR 資料（若尚未快取或進行中）
+    與 get_fhir_data_cached 相同，受 FHIR_DATA_CACHE_ENABLED 控制
+    """
+    if not current_app.config.get('FHIR_DATA_CACHE_ENABLED', True):
+        return
+
+    key = _fhir_data_cache_key(fhir_server_url, patient_id, access_token)
+    with _FHIR_DATA_CACHE_LOCK:
+        if key in _FHIR_DATA_CACHE or key in _PREFETCH_FUTURES:
+            return
+        _PREFETCH_FUTURES[key] = _PREFETCH_EXECUTOR.submit(
+            get_fhir_data, fhir_server_url, access_token, patient_id, client_id)
+
+
+# --- Outbound HTTP ---
+
+# 共用的 requests.Session（HTTP keep-alive + 連線池），首次使用時才建立，
+# 讓 requests 仍維持延遲載入
+_HTTP_SESSION = None
+
+
+def _http_session():
+    """Return the shared requests.Session used by the test-only FHIR routes."""
+    global _HTTP_SESSION
+    if _HTTP_SESSION is None:
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=20,
+                              max_retries=Retry(total=2, backoff_factor=0.2))
+        http.mount('http://', adapter)
+        http.mount('https://', adapter)
+        _HTTP_SESSION = http
+    return _HTTP_SESSION
+
+
 # --- Session Validation ---
 
+# 受保護路由要求 session['fhir_data'] 中必須存在且非空的欄位（依序檢查）
+_REQUIRED_FHIR_KEYS = ('patient', 'server', 'token', 'client_id')
+
 def is_token_expired(token_data):
     """Check if access token is expired or will expire soon."""
     if not token_data:
         return True
     expires_in = token_data.get('expires_in')
-    if not expires_in:
-        return False
-    # Check if token expires within next 5 minutes
-    return expires_in <= 300
+    # Missing/zero expires_in means "unknown", not expired; otherwise
+    # check if token expires within next 5 minutes
+    return bool(expires_in) and expires_in <= 300
 
 
 def session_required(f):
     """Decorator to protect routes that require a valid session."""
+    token_expired = is_token_expired  # 綁定為閉包變數，避免每次請求查找全域名稱
+
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        required_keys = ['patient', 'server', 'token', 'client_id']
-        fhir_data = session.get('fhir_data', {})
-        missing_keys = [
-            key for key in required_keys if key not in fhir_data or not fhir_data[key]]
-        if missing_keys:
-            logging.error(f"Session check failed. Missing keys: {missing_keys}")
+        # session 是 LocalProxy，只查找一次並存為區域變數
+        fhir_data = session.get('fhir_data')
+        if not fhir_data:
+            logging.error("Session check failed. No FHIR session data.")
+            return redirect(url_for('views.logout'))
+        # 成功路徑不配置任何臨時容器；遇到第一個缺少的欄位即返回
+        missing_key = next((key for key in _REQUIRED_FHIR_KEYS if not fhir_data.get(key)), None)
+        if missing_key is not None:
+            logging.error("Session check failed. Missing key: %s", missing_key)
             return redirect(url_for('views.logout'))
         # Simple token expiration check, can be enhanced with refresh logic later
-        if is_token_expired(fhir_data):
+        if token_expired(fhir_data):
             logging.warning("Token expired or close to expiring.")
             # For now, just log out. A real app would implement token refresh.
             return redirect(url_for('views.logout'))
@@ -72,21 +170,25 @@ def main_page():
     """Renders the main risk calculation page."""
     fhir_data = session['fhir_data']
     patient_id = fhir_data['patient']
+    # 頁面隨即會呼叫 /api/calculate_risk，先在背景開始獲取資料
+    _prefetch_fhir_data(
+        fhir_data['server'], fhir_data['token'], patient_id, fhir_data['client_id'])
     return render_template("main.html", patient_id=patient_id)
 
 
+# 一次取出 calculate_risk_api 需要的 session 欄位
+_get_fhir_fields = operator.itemgetter('patient', 'server', 'token', 'client_id')
+
+
 @views_bp.route('/api/calculate_risk')
 @session_required
 def calculate_risk_api():
     """API endpoint to fetch FHIR data and calculate risk."""
-    fhir_data = session['fhir_data']
-    patient_id = fhir_data['patient']
-    fhir_server_url = fhir_data['server']
-    access_token = fhir_data['token']
-    client_id = fhir_data['client_id']
+    patient_id, fhir_server_url, access_token, client_id = _get_fhir_fields(
+        session['fhir_data'])
 
     try:
-        raw_data, error = get_fhir_data(
+        raw_data, error = get_fhir_data_cached(
             fhir_server_url, access_token, patient_id, client_id)
         if error:
             return jsonify(
@@ -114,32 +216,77 @@ def calculate_risk_api():
             {"error": f"An unexpected error occurred: {str(e)}"}), 500
 
 
+# 登出頁面內容固定，於模組載入時建立一次（範本僅讀取）
+_LOGGED_OUT_INFO = {
+    'title': "Logged Out",
+    'message': "You have been successfully logged out.",
+    'suggestions': ["You can now close this window."]
+}
+
+
 @views_bp.route("/logout")
 def logout():
     """Clears the session and shows a logged-out message."""
     session.clear()
-    return render_template("error.html", error_info={
-        'title': "Logged Out",
-        'message': "You have been successfully logged out.",
-        'suggestions': ["You can now close this window."]
-    })
+    return render_template("error.html", error_info=_LOGGED_OUT_INFO)
+
+
+# 健康檢查回應內容固定，預先編碼；每次請求仍建立新的 Response，
+# 因為 after_request 會修改 headers，共用同一物件會在請求間互相污染
+_HEALTH_BODY = b'{"status": "ok"}'
 
 
-@views_bp.route('/health')
+@views_bp.route('/health', strict_slashes=False)
 def health_check():
     """Health check endpoint for container orchestration."""
-    return jsonify({"status": "ok"}), 200
+    # 健康狀態不可被 proxy/負載平衡器快取
+    return Response(_HEALTH_BODY, status=200, mimetype='application/json',
+                    headers={'Cache-Control': 'no-store'})
+
+
 
+# 環境變數在 worker 啟動後不會改變，於載入時判斷一次
+_IS_PRODUCTION = (
+    os.environ.get('FLASK_ENV') == 'production' or 
+    os.environ.get('PRODUCTION') == 'true' or
+    os.environ.get('GAE_ENV') == 'standard'
+)
+
+
+# 測試路由在正式環境的拒絕頁面內容（固定、不含任何請求相關資料）
+_DENIAL_INFO = {
+    'test_mode': {
+        'title': "Access Denied", 
+        'message': "Test mode is not available in production environment."
+    },
+    'test_page': {
+        'title': "Access Denied", 
+        'message': "Test page is not available in production environment."
+    },
+    'demo_mode': {
+        'title': "Access Denied", 
+        'message': "Demo mode is not available in production environment."
+    },
+}
+
+
+# 測試/示範路由預設使用的內部 FHIR 伺服器
+_DEFAULT_FHIR_SERVER = 'http://10.29.99.18:9091/fhir'
+
+
+def _render_denial(kind):
+    """
+    Render the access-denied page for a test route.
+
+    Only the static _DENIAL_INFO content is shared; the page itself is rendered
+    per request because the template's url_for() links depend on the request.
+    """
+    return render_template('error.html', error_info=_DENIAL_INFO[kind])
 
 
 def check_production_access():
     """Check if we are in production environment and deny access to test routes."""
-    is_production = (
-        os.environ.get('FLASK_ENV') == 'production' or 
-        os.environ.get('PRODUCTION') == 'true' or
-        os.environ.get('GAE_ENV') == 'standard'
-    )
-    if is_production:
+    if _IS_PRODUCTION:
         logging.warning("Security: Attempted access to test route in production.")
         return True
     return False
@@ -153,13 +300,10 @@ def test_mode():
     """
     # Security Check
     if check_production_access():
-        return render_template('error.html', error_info={
-            'title': "Access Denied", 
-            'message': "Test mode is not available in production environment."
-        }), 403
+        return _render_denial('test_mode'), 403
 
     # Allow custom FHIR server from URL parameter, or use default
-    test_fhir_server = request.args.get('server', 'http://10.29.99.18:9091/fhir')
+    test_fhir_server = request.args.get('server', _DEFAULT_FHIR_SERVER)
     
     # Allow custom patient ID from URL parameter, or use default
     test_patient_id = request.args.get('patient_id', 'smart-1288992')
@@ -175,7 +319,6 @@ def test_mode():
         'scope': 'patient/*.read',
         'test_mode': True  # Flag to indicate this is test mode
     }
-    session['patient_id'] = test_patient_id
     
     logging.info(f"Test mode activated - Server: {test_fhir_server}, Patient: {test_patient_id}")
     
@@ -189,14 +332,10 @@ def test_patients():
     """
     # Security Check
     if check_production_access():
-        return render_template('error.html', error_info={
-            'title': "Access Denied", 
-            'message': "Test page is not available in production environment."
-        }), 403
+        return _render_denial('test_page'), 403
 
     # Default to the internal server
-    default_server = 'http://10.29.99.18:9091/fhir'
-    fhir_server = request.args.get('server', default_server)
+    fhir_server = request.args.get('server', _DEFAULT_FHIR_SERVER)
     
     # We no longer fetch the patient list as requested, just show the form
     return render_template('test_patients.html', 
@@ -213,13 +352,10 @@ def demo_patient():
     """
     # Security Check
     if check_production_access():
-        return render_template('error.html', error_info={
-            'title': "Access Denied", 
-            'message': "Demo mode is not available in production environment."
-        }), 403
+        return _render_denial('demo_mode'), 403
 
     # Configuration
-    target_server = 'http://10.29.99.18:9091/fhir'
+    target_server = _DEFAULT_FHIR_SERVER
     target_patient_id = '87902'
 
     # Create a mock session
@@ -233,74 +369,171 @@ def demo_patient():
         'scope': 'patient/*.read',
         'test_mode': True
     }
-    session['patient_id'] = target_patient_id
     
     logging.info(f"Demo mode activated - Server: {target_server}, Patient: {target_patient_id}")
     
     # Redirect directly to the main calculation page
     return redirect(url_for('views.main_page'))
+
+
+# /test-patients-list 的病人清單快取（依 FHIR 伺服器），測試資料變動很少
+# gevent worker 會 monkey-patch threading，因此 threading.Lock 在其下同樣適用
+_PATIENT_LIST_CACHE = TTLCache(maxsize=8, ttl=60)
+_PATIENT_LIST_CACHE_LOCK = threading.Lock()
+
+
+def _format_name(names):
+    """Return a display name from a FHIR Patient.name list."""
+    if not names:
+        return 'Unknown Name'
+    name_obj = names[0]
+    text = name_obj.get('text')
+    if text:
+        return text
+    given = ' '.join(name_obj.get('given', []))
+    return f"{given} {name_obj.get('family', '')}".strip()
+
+
+def _summarize_patient(patient):
+    """Build the row shown on the test patient list from a Patient resource."""
+    gender = (patient.get('gender') or 'Unknown').capitalize()
+    return {
+        'id': patient.get('id', 'Unknown'),
+        'name': _format_name(patient.get('name')),
+        'gender': gender,
+        'birthDate': patient.get('birthDate', 'Unknown'),
+        'description': f'{gender} patient'
+    }
+
+
+def _stream_bundle_patients(raw):
+    """
+    以 ijson 串流解析 Patient searchset Bundle，逐筆建立 entry 而不緩衝整個 Bundle
+
+    Args:
+        raw: 回應的原始串流（已啟用 decode_content）
+
+    Returns:
+        list or None: 病人清單列；若頂層不是 Bundle 則返回 None
+    """
+    # ijson 只在測試用的病人清單路由使用，延遲載入（與 requests 相同的做法）
+    import ijson
+
+    resource_type = None
+    patients = []
+    builder = None
+    for prefix, event, value in ijson.parse(raw):
+        if builder is not None:
+            if prefix == 'entry.item' and event == 'end_map':
+                patient = builder.value.get('resource', {})
+                builder = None
+                if patient.get('resourceType') == 'Patient':
+                    patients.append(_summarize_patient(patient))
+            else:
+                builder.event(event, value)
+        elif prefix == 'entry.item' and event == 'start_map':
+            builder = ijson.ObjectBuilder()
+            builder.event(event, value)
+        elif prefix == 'resourceType' and event == 'string':
+            resource_type = value
+    return patients if resource_type == 'Bundle' else None
+
+
+# ?pages=N 時每頁筆數與上限（各頁並行請求）
+_PATIENT_PAGE_SIZE = 50
+_MAX_PATIENT_PAGES = 10
+_PATIENT_SEARCH_PARAMS = {'_count': _PATIENT_PAGE_SIZE}
+_PATIENT_SEARCH_HEADERS = {'Accept': 'application/fhir+json', 'Accept-Encoding': 'gzip, deflate'}
+
+
+def _fetch_patient_page(fhir_server, offset):
+    """
+    獲取一頁病人清單
+
+    Returns:
+        tuple: (病人清單列或 None, HTTP 狀態碼)
+    """
+    # 共用的查詢參數不可就地修改，有 offset 時另建一份
+    params = {**_PATIENT_SEARCH_PARAMS, '_offset': offset} if offset else _PATIENT_SEARCH_PARAMS
+    with _http_session().get(
+        f"{fhir_server}/Patient",
+        params=params, 
+        headers=_PATIENT_SEARCH_HEADERS,
+        timeout=10,
+        stream=True
+    ) as response:
+        if response.status_code != 200:
+            return None, response.status_code
+        # 邊接收邊解析；讓 urllib3 處理 gzip/deflate 解壓縮
+        response.raw.decode_content = True
+        return _stream_bundle_patients(response.raw), response.status_code
+
+
+@views_bp.route('/test-patients-list')
+def test_patients_list():
+    """
+    Fetch and display a paginated list of patients (pool of 50).
+    """
+    # requests 只在此測試路由使用，延遲載入以縮短模組啟動時間（例外類別用）
+    import requests
+
     # Security Check
     if check_production_access():
-        return render_template('error.html', error_info={
-            'title': "Access Denied", 
-            'message': "Test page is not available in production environment."
-        }), 403
+        return _render_denial('test_page'), 403
 
     # Default to the internal server
-    default_server = 'http://10.29.99.18:9091/fhir'
-    fhir_server = request.args.get('server', default_server)
+    fhir_server = request.args.get('server', _DEFAULT_FHIR_SERVER)
+    # ?pages=N 以 _offset 並行獲取 N 頁（每頁 50 筆，最多 10 頁）
+    pages = max(1, min(request.args.get('pages', 1, type=int), _MAX_PATIENT_PAGES))
+    cache_key = (fhir_server, pages)
     
     patients = []
     error = None
     
+    # ?refresh=1 可略過快取，強制重新查詢
+    if request.args.get('refresh') != '1':
+        with _PATIENT_LIST_CACHE_LOCK:
+            cached_patients = _PATIENT_LIST_CACHE.get(cache_key)
+        if cached_patients is not None:
+            return render_template('test_patients_list.html', 
+                                 patients=cached_patients, 
+                                 fhir_server=fhir_server,
+                                 error=None)
+    
     try:
-        # Fetch 50 patients from FHIR server
-        response = requests.get(
-            f"{fhir_server}/Patient",
-            params={'_count': 50}, 
-            headers={'Accept': 'application/fhir+json'},
-            timeout=10
-        )
-        
-        if response.status_code == 200:
-            bundle = response.json()
-            
-            if bundle.get('resourceType') == 'Bundle' and 'entry' in bundle:
-                for entry in bundle['entry']:
-                    patient = entry.get('resource', {})
-                    if patient.get('resourceType') == 'Patient':
-                        # Extract patient information
-                        patient_id = patient.get('id', 'Unknown')
-                        
-                        # Get name
-                        names = patient.get('name', [])
-                        if names and len(names) > 0:
-                            name_obj = names[0]
-                            if name_obj.get('text'):
-                                full_name = name_obj.get('text')
-                            else:
-                                given = ' '.join(name_obj.get('given', []))
-                                family = name_obj.get('family', '')
-                                full_name = f"{given} {family}".strip()
-                        else:
-                            full_name = 'Unknown Name'
-                        
-                        # Get other details
-                        gender = patient.get('gender', 'Unknown')
-                        birth_date = patient.get('birthDate', 'Unknown')
-                        
-                        patients.append({
-                            'id': patient_id,
-                            'name': full_name,
-                            'gender': gender.capitalize() if gender else 'Unknown',
-                            'birthDate': birth_date,
-                            'description': f'{gender.capitalize() if gender else "Unknown"} patient'
-                        })
-            else:
-                # No entries found
-                pass
+        # Fetch 50 patients per page from FHIR server (pages in parallel)
+        offsets = [page * _PATIENT_PAGE_SIZE for page in range(pages)]
+        if pages == 1:
+            results = [_fetch_patient_page(fhir_server, 0)]
         else:
-            error = f"Failed to fetch patients: HTTP {response.status_code}"
+            with ThreadPoolExecutor(max_workers=min(pages, 8)) as executor:
+                results = list(executor.map(
+                    lambda offset: _fetch_patient_page(fhir_server, offset), offsets))
+        
+        bundles_ok = True
+        # 忽略 _offset 的伺服器每頁都會返回第一頁，依 id 去除重複的病人
+        seen_ids = set()
+        for page_patients, status_code in results:
+            if status_code != 200:
+                error = f"Failed to fetch patients: HTTP {status_code}"
+                bundles_ok = False
+                break
+            if page_patients is None:
+                bundles_ok = False
+                continue
+            for patient in page_patients:
+                patient_id = patient['id']
+                if patient_id != 'Unknown':
+                    if patient_id in seen_ids:
+                        continue
+                    seen_ids.add(patient_id)
+                patients.append(patient)
+        
+        if error:
+            patients = []
+        elif bundles_ok:
+            with _PATIENT_LIST_CACHE_LOCK:
+                _PATIENT_LIST_CACHE[cache_key] = patients
             
     except requests.exceptions.ConnectTimeout:
         error = "連線逾時：無法連接到測試伺服器。請確認您已連接到內部網路 (VPN) 或伺服器是否正常運作。"
@@ -319,10 +552,3 @@ def demo_patient():
                          patients=patients, 
                          fhir_server=fhir_server,
                          error=error)
-
-
-@views_bp.route('/test-patients-list')
-def test_patients_list():
-    """
-    Fetch and display a paginated list of patients (pool of 50).
-    """